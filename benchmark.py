@@ -0,0 +1,424 @@
+# Times each stage of the parser and NLP pipeline on the sample ASTs, the NLP
+#  test inputs and synthetic contracts, and checks that outputs, and the tags
+#  magic_nlp's fast path gives, are unchanged.
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from functools import reduce
+
+import magic_nlp
+import parser
+
+# The magic_nlp functions timed as stages, by stage name. Time is exclusive:
+#  while preproc calls the tagger, that time counts as tagging, not preproc.
+_STAGE_FUNCTIONS = {"tag": ["pos_tag", "pos_tag_all"],
+                    "grammar_parse": ["parse_tags"],
+                    "preproc": ["preproc"],
+                    "concat": ["concat"]}
+STAGES = ["load", "traversal", "tag", "grammar_parse", "preproc", "concat"]
+
+# Synthetic contract shapes: (functions, statements per function, depth of
+#  each statement's expression)
+SHAPES = {"many_functions": (300, 4, 3),
+          "long_blocks": (4, 300, 3),
+          "deep_expressions": (2, 4, 1000)}
+
+# Camel case names, so that split_var_name and the tagger have words to chew on
+_WORDS = ["balance", "owner", "amount", "total", "supply", "allowance", "voter",
+          "weight", "proposal", "count", "bid", "highest", "bidder", "deadline",
+          "price", "seller", "buyer", "value", "index", "limit"]
+
+
+class StageTimer:
+    """Accumulates the exclusive time spent in each stage. Stages nest, and
+       a stage's time stops while a stage inside it runs"""
+
+    def __init__(self):
+        self.times = dict.fromkeys(STAGES, 0.0)
+        self._stack = [] # (stage, start time, time spent in nested stages)
+
+    def enter(self, stage):
+        self._stack.append([stage, time.perf_counter(), 0.0])
+
+    def exit(self):
+        stage, start, nested = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.times[stage] += elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def wrap(self, stage, func):
+        """Returns func, timed as stage"""
+        def timed(*args, **kwargs):
+            self.enter(stage)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit()
+        return timed
+
+def _instrument(timer):
+    """Replaces the staged magic_nlp functions with timed ones.
+       Returns the originals, to restore with _restore"""
+    originals = {}
+    for stage, names in _STAGE_FUNCTIONS.items():
+        for name in names:
+            originals[name] = getattr(magic_nlp, name)
+            setattr(magic_nlp, name, timer.wrap(stage, originals[name]))
+    return originals
+
+def _restore(originals):
+    for name, func in originals.items():
+        setattr(magic_nlp, name, func)
+
+def _reset_caches():
+    """Forgets everything memoized by earlier runs, so each run starts cold"""
+    magic_nlp._parse_memo.clear()
+    magic_nlp._tree_memo.clear()
+    magic_nlp._predictions.clear()
+    parser.split_var_name.cache_clear()
+
+def time_translation(json_path):
+    """Loads and translates one solc json file, timing each stage.
+       Returns the stage times and the description"""
+    _reset_caches()
+    timer = StageTimer()
+    originals = _instrument(timer)
+    try:
+        timer.enter("load")
+        nodes = list(parser.iter_solc_nodes(json_path))
+        timer.exit()
+        timer.enter("traversal")
+        description = parser.translate_nodes(nodes)
+        timer.exit()
+    finally:
+        _restore(originals)
+    return timer.times, description
+
+def time_nlp(strings):
+    """Combines strings the way magic_nlp's main does, timing each stage.
+       Returns the stage times"""
+    _reset_caches()
+    timer = StageTimer()
+    originals = _instrument(timer)
+    try:
+        timer.enter("traversal")
+        str(reduce(magic_nlp.concat, magic_nlp.preproc(strings), ""))
+        timer.exit()
+    finally:
+        _restore(originals)
+    return timer.times
+
+def best_of(repeat, func, *args):
+    """Runs func repeat times. Returns the fastest run's stage times (with
+       their total) and its other results"""
+    best = None
+    for _ in range(repeat):
+        result = func(*args)
+        times = result[0] if isinstance(result, tuple) else result
+        times = dict(times, total=sum(times.values()))
+        if best is None or times["total"] < best[0]["total"]:
+            best = (times, result)
+    return best
+
+def synthetic_ast(functions, statements, depth, seed=0):
+    """Builds a compact AST for a contract with the given number of functions,
+       each a block of statements (assignments, requires, ifs and for loops)
+       whose expressions nest depth levels deep"""
+    rng = random.Random(seed)
+    next_id = [0]
+
+    def node(node_type, **fields):
+        next_id[0] += 1
+        return dict(id=next_id[0], src="0:0:0", nodeType=node_type, **fields)
+
+    def name():
+        return rng.choice(_WORDS) + rng.choice(_WORDS).capitalize()
+
+    def leaf():
+        kind = rng.random()
+        if kind < 0.15:
+            return node("MemberAccess", memberName=rng.choice(["sender", "value"]),
+                        expression=node("Identifier", name="msg"))
+        if kind < 0.3:
+            return node("Literal", kind="number", value=str(rng.randint(0, 1000)))
+        if kind < 0.45:
+            return node("IndexAccess", baseExpression=node("Identifier", name=name()),
+                        indexExpression=node("Identifier", name=name()))
+        return node("Identifier", name=name())
+
+    # Built bottom up, so any depth can be made without recursing
+    def expression(depth):
+        expr = leaf()
+        for _ in range(depth - 1):
+            if rng.random() < 0.1:
+                expr = node("UnaryOperation", operator="!", prefix=True,
+                            subExpression=expr)
+            else:
+                expr = node("BinaryOperation",
+                            operator=rng.choice(sorted(parser.binary_op_to_english)),
+                            leftExpression=expr, rightExpression=leaf())
+        return expr
+
+    def assignment():
+        return node("ExpressionStatement", expression=node(
+            "Assignment", operator=rng.choice(sorted(parser.assignment_op_to_english)),
+            leftHandSide=node("Identifier", name=name()),
+            rightHandSide=expression(depth)))
+
+    def statement():
+        kind = rng.random()
+        if kind < 0.6:
+            return assignment()
+        if kind < 0.75:
+            return node("ExpressionStatement", expression=node(
+                "FunctionCall", expression=node("Identifier", name="require"),
+                arguments=[expression(depth)]))
+        if kind < 0.9:
+            return node("IfStatement", condition=expression(depth),
+                        trueBody=node("Block", statements=[assignment()]),
+                        falseBody=None)
+        return node("ForStatement",
+                    initializationExpression=node(
+                        "VariableDeclarationStatement",
+                        declarations=[node("VariableDeclaration", name="i")],
+                        initialValue=node("Literal", kind="number", value="0")),
+                    condition=node("BinaryOperation", operator="<",
+                                   leftExpression=node("Identifier", name="i"),
+                                   rightExpression=node("Identifier", name=name())),
+                    loopExpression=node("ExpressionStatement", expression=node(
+                        "UnaryOperation", operator="++", prefix=False,
+                        subExpression=node("Identifier", name="i"))),
+                    body=node("Block", statements=[assignment()]))
+
+    contract_nodes = [node("PragmaDirective", literals=["solidity", "^", "0.4", ".0"])]
+    for index in range(functions):
+        contract_nodes.append(node(
+            "FunctionDefinition", name="function%d" % index, payable=False,
+            parameters=node("ParameterList", parameters=[]),
+            body=node("Block", statements=[statement() for _ in range(statements)])))
+    return node("SourceUnit", nodes=[node("ContractDefinition", name="Synthetic",
+                                          nodes=contract_nodes)])
+
+def write_solc_json(ast, file_path):
+    """Writes ast the way solc --ast-compact-json prints it. Encodes with an
+       explicit stack, since the json module can't nest as deep as
+       synthetic_ast can"""
+    chunks = ["JSON AST (compact format):\n\n\n======= %s =======\n"
+              % os.path.basename(file_path)]
+    # Text to write as is is pushed as a 1-tuple, values as themselves
+    stack = [ast]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, tuple):
+            chunks.append(item[0])
+        elif isinstance(item, dict):
+            chunks.append("{")
+            stack.append(("}",))
+            for index, key in reversed(list(enumerate(item))):
+                stack.append(item[key])
+                stack.append((("," if index else "") + json.dumps(key) + ":",))
+        elif isinstance(item, list):
+            chunks.append("[")
+            stack.append(("]",))
+            for index in reversed(range(len(item))):
+                stack.append(item[index])
+                if index:
+                    stack.append((",",))
+        else:
+            chunks.append(json.dumps(item))
+    chunks.append("\n")
+    with open(file_path, 'w') as out_file:
+        out_file.write("".join(chunks))
+
+def _expected_path(json_path, expected_dir):
+    """The expected_dir/<name>.out a batch run would write for json_path"""
+    return os.path.join(
+        expected_dir, os.path.splitext(os.path.basename(json_path))[0] + ".out")
+
+def record_output(json_path, description, expected_dir):
+    """Saves a description as the expected output for json_path"""
+    os.makedirs(expected_dir, exist_ok=True)
+    with open(_expected_path(json_path, expected_dir), 'w') as expected_file:
+        expected_file.write(description + "\n")
+
+def check_output(json_path, description, expected_dir):
+    """Compares a description with the one recorded for json_path (see
+       record_output). Returns None if it matches (or there is nothing to
+       compare with), otherwise the first differing line"""
+    expected_path = _expected_path(json_path, expected_dir)
+    if not os.path.exists(expected_path):
+        return None
+    with open(expected_path) as expected_file:
+        expected = expected_file.read()
+    actual = description + "\n"
+    if actual == expected:
+        return None
+    expected_lines = expected.split("\n")
+    actual_lines = actual.split("\n")
+    for line_number, (old, new) in enumerate(zip(expected_lines, actual_lines), 1):
+        if old != new:
+            return "line %d: expected %r, got %r" % (line_number, old, new)
+    return "expected %d lines, got %d" % (len(expected_lines), len(actual_lines))
+
+def check_tags(corpus, nlp_inputs):
+    """Tags every phrase the corpus and the NLP inputs send to the tagger
+       with magic_nlp's fast path and with nltk.word_tokenize and
+       nltk.pos_tag. Returns {phrase: [fast tags, NLTK tags]} where they
+       differ"""
+    _reset_caches()
+    phrases = []
+    tokenize = magic_nlp.tokenize
+    magic_nlp.tokenize = lambda string: phrases.append(string) or tokenize(string)
+    try:
+        for json_path in corpus:
+            parser.translate_nodes(parser.iter_solc_nodes(json_path))
+        for nlp_path in nlp_inputs:
+            with open(nlp_path) as nlp_file:
+                magic_nlp.describe(nlp_file.read().splitlines())
+    finally:
+        magic_nlp.tokenize = tokenize
+    nltk = magic_nlp.nltk
+    mismatches = {}
+    for phrase in dict.fromkeys(phrases):
+        fast = magic_nlp.pos_tag(phrase)
+        slow = nltk.pos_tag(nltk.word_tokenize(phrase))
+        if fast != slow:
+            mismatches[phrase] = [fast, slow]
+    return mismatches
+
+def compare(results, baseline, tolerance):
+    """Compares each benchmark's stage times with the baseline's.
+       Returns {benchmark: {stage: new time / old time}} and a list of
+       regressions, stages over 1 + tolerance times slower"""
+    ratios = {}
+    regressions = []
+    for name, times in results["benchmarks"].items():
+        old_times = baseline.get("benchmarks", {}).get(name)
+        if old_times is None:
+            continue
+        ratios[name] = {}
+        for stage, seconds in times.items():
+            old = old_times.get(stage)
+            # Stages that hardly ran are too noisy to compare
+            if not old or old < 0.001:
+                continue
+            ratios[name][stage] = round(seconds / old, 3)
+            if ratios[name][stage] > 1 + tolerance:
+                regressions.append("%s %s: %.4fs -> %.4fs (x%.2f)"
+                                   % (name, stage, old, seconds, ratios[name][stage]))
+    return ratios, regressions
+
+def run(corpus, nlp_inputs, shapes, expected_dir, repeat, scale, record=False):
+    """Runs every benchmark. Returns the results, ready to dump as json.
+       With record, the corpus translations are saved to expected_dir
+       rather than compared with it"""
+    results = {"python": platform.python_version(), "repeat": repeat,
+               "benchmarks": {}, "output_mismatches": {},
+               "tag_mismatches": check_tags(corpus, nlp_inputs)}
+    for json_path in corpus:
+        name = os.path.splitext(os.path.basename(json_path))[0]
+        times, (_, description) = best_of(repeat, time_translation, json_path)
+        results["benchmarks"][name] = times
+        if record:
+            record_output(json_path, description, expected_dir)
+            continue
+        mismatch = check_output(json_path, description, expected_dir)
+        if mismatch is not None:
+            results["output_mismatches"][name] = mismatch
+    for nlp_path in nlp_inputs:
+        with open(nlp_path) as nlp_file:
+            strings = [string.strip() for string in nlp_file]
+        name = os.path.splitext(os.path.basename(nlp_path))[0]
+        times, _ = best_of(repeat, time_nlp, strings)
+        results["benchmarks"][name] = times
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, (functions, statements, depth) in shapes.items():
+            json_path = os.path.join(temp_dir, name + ".json")
+            write_solc_json(synthetic_ast(max(1, int(functions * scale)),
+                                          max(1, int(statements * scale)),
+                                          depth), json_path)
+            times, _ = best_of(repeat, time_translation, json_path)
+            results["benchmarks"]["synthetic_" + name] = times
+    return results
+
+def _parse_shape(shape):
+    """Parses a NAME=FUNCTIONS,STATEMENTS,DEPTH --shape argument"""
+    try:
+        name, sizes = shape.split("=")
+        functions, statements, depth = (int(size) for size in sizes.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "expected NAME=FUNCTIONS,STATEMENTS,DEPTH, got %r" % shape)
+    return name, (functions, statements, depth)
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Time each stage of the parser and NLP pipeline")
+    arg_parser.add_argument("--corpus", default="solidityFiles/*.json",
+                            help="glob of solc json files (default: solidityFiles/*.json)")
+    arg_parser.add_argument("--nlp-inputs", default="tests/nlp_test*.in",
+                            help="glob of magic_nlp inputs (default: tests/nlp_test*.in)")
+    arg_parser.add_argument("--expected", default="benchmarkOutputs",
+                            help="directory of expected .out files, recorded with --record"
+                                 " (default: benchmarkOutputs)")
+    arg_parser.add_argument("--record", action="store_true",
+                            help="save the corpus translations to --expected instead of"
+                                 " comparing with them")
+    arg_parser.add_argument("--shape", action="append", type=_parse_shape, default=[],
+                            metavar="NAME=FUNCTIONS,STATEMENTS,DEPTH",
+                            help="add a synthetic contract (repeatable)")
+    arg_parser.add_argument("--scale", type=float, default=1.0,
+                            help="multiply the synthetic functions and statements by this")
+    arg_parser.add_argument("--repeat", type=int, default=3,
+                            help="runs per benchmark; the fastest is kept (default: 3)")
+    arg_parser.add_argument("--out", default="benchmark.json",
+                            help="where to write the results (default: benchmark.json)")
+    arg_parser.add_argument("--baseline", default=None, metavar="PATH",
+                            help="earlier results to compare with")
+    arg_parser.add_argument("--tolerance", type=float, default=0.1,
+                            help="slowdown allowed against the baseline (default: 0.1)")
+    arg_parser.add_argument("--nltk-data", default=None, metavar="DIR",
+                            help="directory holding NLTK's punkt and tagger models")
+    args = arg_parser.parse_args()
+    if args.nltk_data is not None:
+        magic_nlp.use_nltk_data(args.nltk_data)
+
+    results = run(sorted(glob.glob(args.corpus)), sorted(glob.glob(args.nlp_inputs)),
+                  dict(SHAPES, **dict(args.shape)), args.expected, args.repeat,
+                  args.scale, args.record)
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            results["baseline"] = args.baseline
+            results["ratios"], regressions = compare(
+                results, json.load(baseline_file), args.tolerance)
+        results["regressions"] = regressions
+    with open(args.out, 'w') as out_file:
+        json.dump(results, out_file, indent=2, sort_keys=True)
+
+    print("%-28s" % "benchmark" + "".join("%14s" % stage for stage in STAGES + ["total"]))
+    for name, times in results["benchmarks"].items():
+        print("%-28s" % name + "".join("%14.4f" % times[stage]
+                                       for stage in STAGES + ["total"]))
+    if args.record:
+        print("outputs recorded in " + args.expected)
+    elif not os.path.isdir(args.expected):
+        print("no outputs recorded in %s to compare with; run with --record first"
+              % args.expected)
+    for name, mismatch in results["output_mismatches"].items():
+        print("OUTPUT CHANGED %s: %s" % (name, mismatch))
+    for phrase, (fast, slow) in results["tag_mismatches"].items():
+        print("TAGS CHANGED %r: %s, NLTK gives %s" % (phrase, fast, slow))
+    for regression in regressions:
+        print("SLOWER %s" % regression)
+    print("results written to " + args.out)
+    sys.exit(1 if results["output_mismatches"] or results["tag_mismatches"]
+             or regressions else 0)
@@ -0,0 +1,303 @@
+# A chart parser compiled once per grammar, returning NLTK's first parse tree.
+
+# Raised when a parse adds more edges to its chart than it was allowed.
+class ParseBudgetExceeded(Exception):
+    pass
+
+
+# How many times the fundamental rule may be tried per allowed edge. Combining
+#  edges that are already in the chart adds no edges but still takes time, and
+#  long ambiguous inputs can do it millions of times between new edges.
+_STEPS_PER_EDGE = 10
+
+
+# Parses tag sequences with a fixed CFG.
+# This runs the same bottom-up left-corner, agenda-driven algorithm as
+#  nltk.ChartParser (whose default strategy is BU_LC_STRATEGY), so edges enter
+#  the chart in the same order and the first tree is the one NLTK would yield
+#  first. The grammar is converted to integer tables up front, edges are plain
+#  integers instead of objects, and only the first tree is read off the chart
+#  rather than every tree in the parse forest. Edges that could never be
+#  advanced aren't added, and an edge taken off the agenda again only
+#  combines the child pointer lists it gained since, which leaves the chart
+#  (and so the first tree) as NLTK would build it.
+class CompiledParser:
+    # cfg - The nltk.CFG to compile
+    def __init__(self, cfg):
+        from nltk.tree import Tree
+        self._tree_class = Tree
+        symbols = {}
+
+        def symbol_id(symbol):
+            if symbol not in symbols:
+                symbols[symbol] = len(symbols)
+            return symbols[symbol]
+
+        self._root = symbol_id(cfg.start())
+        self._labels = []
+        self._lhs = []
+        self._rhs = []
+        # The productions whose right-hand side starts with a symbol, in
+        #  grammar order.
+        self._rhs_index = {}
+        for prod_id, prod in enumerate(cfg.productions()):
+            self._labels.append(prod.lhs().symbol())
+            self._lhs.append(symbol_id(prod.lhs()))
+            self._rhs.append(tuple(symbol_id(sym) for sym in prod.rhs()))
+            if prod.rhs():
+                self._rhs_index.setdefault(self._rhs[-1][0], []) \
+                               .append(prod_id)
+        self._terminals = {sym: sym_id for sym, sym_id in symbols.items()
+                           if isinstance(sym, str)}
+        # What bottom-up prediction adds for a complete edge of each symbol:
+        #  (production, its lhs, the symbol after the dot or -1).
+        self._predictions = {
+            sym: [(prod, self._lhs[prod],
+                   self._rhs[prod][1] if len(self._rhs[prod]) > 1 else -1)
+                  for prod in prod_ids]
+            for sym, prod_ids in self._rhs_index.items()}
+        # The symbols that can start with each terminal, i.e. whose
+        #  expansions can begin with it. Like NLTK's BU_LC_STRATEGY, this
+        #  parser has no rule for empty productions, so only the first symbol
+        #  of each right-hand side matters.
+        first = {sym_id: {sym_id} for sym_id in self._terminals.values()}
+        for lhs in self._lhs:
+            first.setdefault(lhs, set())
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in zip(self._lhs, self._rhs):
+                if rhs and not first[rhs[0]] <= first[lhs]:
+                    first[lhs] |= first[rhs[0]]
+                    changed = True
+        self._starts = {tok: frozenset(sym for sym, terminals in first.items()
+                                       if tok in terminals)
+                        for tok in self._terminals.values()}
+
+    # tokens - A sequence of terminals (here, POS tags)
+    # max_edges - Raise ParseBudgetExceeded once the chart holds more edges
+    #  than this (or the fundamental rule has been tried more than
+    #  _STEPS_PER_EDGE times as often), or None for no limit
+    # Returns the first parse tree, or None if the tokens could not be parsed.
+    def parse(self, tokens, max_edges=None):
+        tokens = list(tokens)
+        missing = [tok for tok in tokens if tok not in self._terminals]
+        if missing:
+            missing = ", ".join(f"{w!r}" for w in missing)
+            raise ValueError(
+                "Grammar does not cover some of the input words: %r." % missing)
+
+        rhs_of, predictions = self._rhs, self._predictions
+        # The symbols that can start at each position. An incomplete edge
+        #  whose next symbol can't start where it ends can never be advanced,
+        #  so it adds no edges and is part of no tree. Such dead edges aren't
+        #  added to the chart. They still count towards max_edges, and a -1
+        #  goes on the agenda wherever NLTK would have put them, so a parse
+        #  goes over its budget exactly when it would have with them.
+        token_ids = [self._terminals[tok] for tok in tokens]
+        starts = [self._starts[tok] for tok in token_ids] + [frozenset()]
+        # Dead edges' child pointer lists, by key
+        dead_cpls = {}
+        dead_count = 0
+        # The complete edges that have been predicted from, and the
+        #  (start, end, symbol) of each, as those predict the same edges.
+        predicted = set()
+        predicted_spans = set()
+
+        # One (start, end, prod, dot, lhs, next symbol) tuple per edge, indexed
+        #  by edge id, with next symbol -1 for complete edges and prod -1 for
+        #  leaf edges. cpls holds each edge's child pointer lists, in order,
+        #  and cpl_sets the same as a set.
+        edges = []
+        cpls = []
+        cpl_sets = []
+        # How many of a left edge's child pointer lists have been combined
+        #  with each right edge, by (left, right). Combining those again adds
+        #  nothing, so when either edge comes off the agenda again, only the
+        #  ones added since are.
+        combined = {}
+        combined_get = combined.get
+        edge_ids = {}
+        # (start, lhs) -> complete edges, (end, next symbol) -> incomplete
+        #  edges, each in insertion order.
+        complete_index = {}
+        incomplete_index = {}
+
+        # Returns the new or modified edge, -1 for a new or modified dead
+        #  edge, or None.
+        def insert(key, lhs, next_sym, new_cpls):
+            nonlocal dead_count
+            edge = edge_ids.get(key)
+            if edge is None:
+                if next_sym >= 0 and next_sym not in starts[key[1]]:
+                    edge_cpls = dead_cpls.get(key)
+                    if edge_cpls is None:
+                        dead_cpls[key] = set(new_cpls)
+                        dead_count += 1
+                        return -1
+                    size = len(edge_cpls)
+                    edge_cpls.update(new_cpls)
+                    return -1 if len(edge_cpls) > size else None
+                edge = len(edges)
+                edge_ids[key] = edge
+                edges.append(key + (lhs, next_sym))
+                cpls.append(list(new_cpls))
+                cpl_sets.append(set(new_cpls))
+                if next_sym < 0:
+                    complete_index.setdefault((key[0], lhs), []).append(edge)
+                else:
+                    incomplete_index.setdefault((key[1], next_sym), []) \
+                                    .append(edge)
+                return edge
+            edge_cpls = cpls[edge]
+            edge_cpl_set = cpl_sets[edge]
+            modified = False
+            for cpl in new_cpls:
+                if cpl not in edge_cpl_set:
+                    edge_cpl_set.add(cpl)
+                    edge_cpls.append(cpl)
+                    modified = True
+            return edge if modified else None
+
+        # Advances left over right, combining the child pointer lists from
+        #  the done'th on.
+        def advance(left, right, done):
+            left_cpls = cpls[left]
+            combined[(left, right)] = len(left_cpls)
+            start, _, prod, dot, lhs, _ = edges[left]
+            dot += 1
+            rhs = rhs_of[prod]
+            return insert((start, edges[right][1], prod, dot), lhs,
+                          rhs[dot] if dot < len(rhs) else -1,
+                          [cpl + (right,) for cpl in left_cpls[done:]])
+
+        for index, tok in enumerate(token_ids):
+            insert((index, index + 1, -1, 0), tok, -1, [()])
+
+        max_steps = None if max_edges is None else max_edges * _STEPS_PER_EDGE
+        steps = 0
+        agenda = list(range(len(tokens)))
+        agenda.reverse()
+        while agenda:
+            if max_edges is not None and (len(edges) + dead_count > max_edges
+                                          or steps > max_steps):
+                raise ParseBudgetExceeded(
+                    "Chart parse of %d tokens went over its budget of %d edges"
+                    % (len(tokens), max_edges))
+            edge = agenda.pop()
+            if edge < 0:
+                continue
+            start, end, _, _, lhs, next_sym = edges[edge]
+            new_edges = []
+            if next_sym < 0:
+                # Bottom-up predict: start every production whose right-hand
+                #  side begins with this edge's symbol. Predicting again from
+                #  the same edge modifies no edges.
+                first_time = edge not in predicted
+                predicted.add(edge)
+                span = (start, end, lhs)
+                new_span = span not in predicted_spans
+                predicted_spans.add(span)
+                end_starts = starts[end]
+                for prod, prod_lhs, prod_next in predictions.get(lhs, ()):
+                    if prod_next < 0 or prod_next in end_starts:
+                        # insert, inlined: this is the parser's hottest loop
+                        key = (start, end, prod, 1)
+                        new_edge = edge_ids.get(key)
+                        if new_edge is None:
+                            new_edge = len(edges)
+                            edge_ids[key] = new_edge
+                            edges.append((start, end, prod, 1, prod_lhs, prod_next))
+                            cpls.append([(edge,)])
+                            cpl_sets.append({(edge,)})
+                            if prod_next < 0:
+                                complete_index.setdefault((start, prod_lhs), []) \
+                                              .append(new_edge)
+                            else:
+                                incomplete_index.setdefault((end, prod_next), []) \
+                                                .append(new_edge)
+                            new_edges.append(new_edge)
+                        elif first_time:
+                            cpls[new_edge].append((edge,))
+                            cpl_sets[new_edge].add((edge,))
+                            new_edges.append(new_edge)
+                    else:
+                        dead_count += new_span
+                        if first_time:
+                            new_edges.append(-1)
+            agenda += new_edges
+
+            # Fundamental rule, with this edge on whichever side fits.
+            new_edges = []
+            if next_sym < 0:
+                partners = incomplete_index.get((start, lhs), [])
+                for left in partners:
+                    done = combined_get((left, edge), 0)
+                    if done < len(cpls[left]):
+                        new_edge = advance(left, edge, done)
+                        if new_edge is not None:
+                            new_edges.append(new_edge)
+            else:
+                partners = complete_index.get((end, next_sym), [])
+                edge_cpl_count = len(cpls[edge])
+                for right in partners:
+                    done = combined_get((edge, right), 0)
+                    if done < edge_cpl_count:
+                        new_edge = advance(edge, right, done)
+                        if new_edge is not None:
+                            new_edges.append(new_edge)
+            steps += len(partners)
+            agenda += new_edges
+
+        labels, tree_class = self._labels, self._tree_class
+        memo = {}
+
+        # Mirrors Chart._trees, keeping only the first tree for each edge.
+        #  Trees are as deep as long unambiguous inputs are long, so the chart
+        #  is walked with an explicit stack rather than recursion.
+        def first_tree(edge):
+            # [edge, its child pointer lists not yet tried, the one being
+            #  tried, its children's trees so far] for each edge being built
+            frames = []
+            while True:
+                if edge in memo:
+                    tree = memo[edge]
+                elif edges[edge][2] < 0:
+                    tree = memo[edge] = tokens[edges[edge][0]]
+                else:
+                    # An edge reached again while it is being built yields no
+                    #  trees.
+                    memo[edge] = None
+                    frames.append([edge, iter(cpls[edge]), (), []])
+                    tree = None
+                # Hand the tree to the edges waiting on it until one needs
+                #  another child built.
+                edge = None
+                while frames:
+                    frame = frames[-1]
+                    if tree is None:
+                        # Just started, or a child had no tree: try the next
+                        #  child pointer list.
+                        frame[2] = next(frame[1], None)
+                        frame[3] = []
+                        if frame[2] is None:
+                            frames.pop()
+                            continue
+                    else:
+                        frame[3].append(tree)
+                    if len(frame[3]) < len(frame[2]):
+                        edge = frame[2][len(frame[3])]
+                        break
+                    tree = memo[frame[0]] = tree_class(labels[edges[frame[0]][2]],
+                                                       frame[3])
+                    frames.pop()
+                if edge is None:
+                    return tree
+
+        for edge in complete_index.get((0, self._root), []):
+            if edges[edge][1] == len(tokens):
+                memo.clear()
+                tree = first_tree(edge)
+                if tree is not None:
+                    return tree
+        return None
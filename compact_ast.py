@@ -0,0 +1,177 @@
+# A compact form of solc json ASTs for the translator to run on.
+# Each node type becomes a class with __slots__ for just the fields parser.py's
+#  handlers read, so a node costs a few dozen bytes instead of a dict of every
+#  key solc wrote (src, typeDescriptions, referencedDeclaration, scope, ...)
+#  and its nested dicts. The node type is stored once, on the class.
+# Nodes support the node['field'] and 'field' in node lookups the handlers
+#  use on dicts, so the translator runs on either form unchanged.
+
+import sys
+
+# The fields kept for each node type the translator handles, besides the
+#  node type and id. Project mode also reads a source unit's absolutePath,
+#  and function filters a function's name, visibility, mutability and
+#  modifiers.
+NODE_FIELDS = {
+    'SourceUnit': ('absolutePath', 'nodes'),
+    'PragmaDirective': (),
+    'ContractDefinition': ('nodes',),
+    'VariableDeclaration': ('name',),
+    'VariableDeclarationStatement': ('declarations', 'initialValue'),
+    'Mapping': ('keyType', 'valueType'),
+    'ElementaryTypeName': (),
+    'EventDefinition': ('parameters',),
+    'ModifierDefinition': ('parameters', 'body'),
+    'FunctionDefinition': ('name', 'visibility', 'stateMutability', 'payable',
+                           'modifiers', 'body'),
+    'FunctionCall': ('expression', 'arguments'),
+    'Return': ('expression',),
+    'ParameterList': ('parameters',),
+    'StructDefinition': ('members',),
+    'EnumDefinition': ('members',),
+    'EnumValue': (),
+    'UserDefinedTypeName': (),
+    'ArrayTypeName': ('baseType',),
+    'TupleExpression': ('components',),
+    'Block': ('statements',),
+    'IfStatement': ('condition', 'trueBody', 'falseBody'),
+    'ForStatement': ('initializationExpression', 'condition', 'body',
+                     'loopExpression'),
+    'WhileStatement': ('condition', 'body'),
+    'ExpressionStatement': ('expression',),
+    'Assignment': ('leftHandSide', 'operator', 'rightHandSide'),
+    'UnaryOperation': ('operator', 'subExpression'),
+    'BinaryOperation': ('leftExpression', 'operator', 'rightExpression'),
+    'IndexAccess': ('baseExpression', 'indexExpression'),
+    'MemberAccess': ('expression', 'memberName'),
+    'Identifier': ('name',),
+    'ElementaryTypeNameExpression': (),
+    'PlaceholderStatement': (),
+    'Continue': (),
+    'Literal': ('value',),
+}
+
+
+class Node:
+    __slots__ = ('id',)
+    nodeType = None
+    fields = ()
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def __contains__(self, field):
+        return hasattr(self, field)
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    # Iterates over the node type and the fields set, like a dict's keys.
+    def __iter__(self):
+        return iter([field for field, value in self.items()])
+
+    # Returns (field, value) pairs for the node type and every field set,
+    #  leaving out the id.
+    def items(self):
+        return [('nodeType', self.nodeType)] + \
+               [(field, getattr(self, field)) for field in self.fields
+                if hasattr(self, field)]
+
+    def values(self):
+        return [value for field, value in self.items()]
+
+    def __repr__(self):
+        return "%s(%s)" % (self.nodeType, ", ".join(
+            "%s=%r" % item for item in self.items()[1:]))
+
+
+# A node of a type the translator doesn't handle. Only its type, for the
+#  translator's warning, and its child nodes, for scans of a whole subtree
+#  (like contains_node_type), are kept.
+class UnknownNode(Node):
+    __slots__ = ('nodeType', 'children')
+
+    def items(self):
+        return [('nodeType', self.nodeType), ('children', self.children)]
+
+
+# The Node class of each handled node type, e.g. NODE_CLASSES['Identifier'].
+#  They're module attributes too, so nodes can be pickled to worker processes.
+NODE_CLASSES = {}
+for _node_type, _fields in NODE_FIELDS.items():
+    NODE_CLASSES[_node_type] = globals()[_node_type] = type(
+        _node_type, (Node,),
+        {'__slots__': _fields, 'nodeType': _node_type, 'fields': _fields,
+         '__module__': __name__})
+
+
+# Converts one decoded json object, whose children have been converted
+#  already. Usable as a json object_hook.
+# Returns a Node for an AST node, or the dict itself for anything else.
+def from_dict(js):
+    node_type = js.get('nodeType')
+    if node_type is None:
+        return js
+    node_class = NODE_CLASSES.get(node_type)
+    if node_class is None:
+        node = UnknownNode()
+        node.nodeType = node_type
+        node.children = []
+        for value in js.values():
+            if isinstance(value, Node):
+                node.children.append(value)
+            elif type(value) is list:
+                node.children.extend(item for item in value if isinstance(item, Node))
+    else:
+        node = node_class()
+        for field in node_class.fields:
+            if field in js:
+                value = js[field]
+                if type(value) is str:
+                    value = sys.intern(value)
+                setattr(node, field, value)
+    if 'id' in js:
+        node.id = js['id']
+    return node
+
+
+# Marks where the values pushed for a json object or list end, in compact.
+class _Pending:
+    __slots__ = ('keys', 'size')
+
+    def __init__(self, keys, size):
+        self.keys = keys
+        self.size = size
+
+
+# Converts a whole decoded AST, with an explicit stack, so any depth can be
+#  converted. Fields the compact nodes don't keep aren't visited.
+# js - The AST, as decoded from solc json
+# Returns the compact AST.
+def compact(js):
+    values = []
+    stack = [js]
+    while stack:
+        item = stack.pop()
+        if type(item) is _Pending:
+            children = values[len(values) - item.size:]
+            del values[len(values) - item.size:]
+            if item.keys is None:
+                values.append(children)
+            else:
+                values.append(from_dict(dict(zip(item.keys, children))))
+        elif isinstance(item, dict):
+            node_class = NODE_CLASSES.get(item.get('nodeType'))
+            if node_class is not None:
+                keys = ['nodeType', 'id'] + list(node_class.fields)
+                keys = [key for key in keys if key in item]
+            else:
+                keys = list(item)
+            stack.append(_Pending(keys, len(keys)))
+            stack.extend(item[key] for key in reversed(keys))
+        elif isinstance(item, list):
+            stack.append(_Pending(None, len(item)))
+            stack.extend(reversed(item))
+        else:
+            values.append(item)
+    return values[0]
@@ -2,14 +2,150 @@
 # Christopher Siu (cesiu@calpoly.edu)
 # CSC 570, Winter '18
 
+import re
 import sys
+import time
+from collections import OrderedDict
 from functools import reduce
-from copy import deepcopy
 
-# This is how the magic works:
-import nltk
-nltk.download("punkt")
-nltk.download('averaged_perceptron_tagger')
+import cfg_parser
+import parse_cache
+import profiling
+
+# This is how the magic works: NLTK.
+# It's slow to import and its models are slow to load, so neither happens
+#  until a string actually needs tagging or parsing. Nothing is downloaded;
+#  the models must already be installed where NLTK (or use_nltk_data) looks.
+nltk = None
+_nltk_data = None
+_MISSING_MODELS = """NLTK's punkt tokenizer and averaged perceptron tagger models are required
+but could not be loaded. Install them ahead of time, e.g. with
+  python3 -m nltk.downloader -d <dir> punkt averaged_perceptron_tagger
+(punkt_tab and averaged_perceptron_tagger_eng on NLTK 3.9 and later) and point the NLTK_DATA environment variable (or use_nltk_data) at <dir>.
+%s"""
+
+
+# Adds a directory to search for NLTK models before NLTK's default locations.
+# Must be called before the first string is tagged.
+def use_nltk_data(path):
+    global _nltk_data
+    _nltk_data = path
+
+
+# Imports NLTK on first use.
+# Returns the nltk module.
+def _import_nltk():
+    global nltk
+    if nltk is None:
+        import nltk as nltk_module
+        if _nltk_data is not None:
+            nltk_module.data.path.insert(0, _nltk_data)
+        nltk = nltk_module
+    return nltk
+
+
+# The strings parser.py builds are mostly plain words, numbers and 's. For
+#  those, word_tokenize only splits on whitespace and before 's (Punkt finds
+#  no sentence breaks without . ? or !), except for a few words its Treebank
+#  rules split in two. Anything else goes to word_tokenize.
+_simple_string = re.compile(r"\s*(?:[A-Za-z0-9]+(?:'[sS])?(?:\s+|\Z))*\Z")
+_simple_token = re.compile(r"[A-Za-z0-9]+|'[sS]")
+_split_words = frozenset(["cannot", "gimme", "gonna", "gotta", "lemme", "wanna"])
+
+
+# Splits a string into the tokens nltk.word_tokenize would.
+# string - The string to tokenize
+# Returns a list of tokens.
+def tokenize(string):
+    if _simple_string.match(string):
+        tokens = _simple_token.findall(string)
+        if not any(token.lower() in _split_words for token in tokens):
+            return tokens
+    return _import_nltk().word_tokenize(string)
+
+
+# The tagger nltk.pos_tag uses, loaded on first use.
+_tagger = None
+# The perceptron's predictions, by everything its features are built from.
+_predictions = {}
+_PREDICTION_MEMO_SIZE = 1 << 16
+
+
+# Tags tokens as nltk.pos_tag does, with the same averaged perceptron.
+# Words in the tagger's tag dictionary (frequent, unambiguous ones, which
+#  includes most of parser.py's template words) are tagged from it without
+#  the model, as NLTK does. Other tokens are tagged from their context, so
+#  the model's predictions are memoized by the word, the two tags before it
+#  and the normalized words around it, which is all its features look at.
+# tokens - The tokens to tag
+# Returns a list of (word, tag) pairs.
+def _tag(tokens):
+    global _tagger
+    if _tagger is None:
+        _tagger = _import_nltk().tag.PerceptronTagger()
+    tagdict = _tagger.tagdict
+    context = None
+    prev, prev2 = _tagger.START
+    tags = []
+    for index, word in enumerate(tokens):
+        tag = tagdict.get(word)
+        if not tag:
+            if context is None:
+                context = _tagger.START + [_tagger.normalize(token)
+                                           for token in tokens] + _tagger.END
+            key = (word, prev, prev2) + tuple(context[index:index + 5])
+            tag = _predictions.get(key)
+            if tag is None:
+                tag = _tagger.model.predict(
+                    _tagger._get_features(index, word, context, prev, prev2))
+                if isinstance(tag, tuple): # (tag, confidence) on NLTK 3.8+
+                    tag = tag[0]
+                if len(_predictions) < _PREDICTION_MEMO_SIZE:
+                    _predictions[key] = tag
+        tags.append((word, tag))
+        prev2 = prev
+        prev = tag
+    return tags
+
+
+# Tokenizes and POS tags a string.
+# string - The string to tag
+# Returns a list of (word, tag) pairs.
+def pos_tag(string):
+    _import_nltk()
+    profile = profiling.current
+    if profile is not None:
+        started = time.perf_counter()
+    try:
+        tags = _tag(tokenize(string))
+    except LookupError as e:
+        raise LookupError(_MISSING_MODELS % e) from None
+    if profile is not None:
+        profile.tagger_calls += 1
+        profile.tagger_strings += 1
+        profile.tagger_seconds += time.perf_counter() - started
+    return tags
+
+
+# Tokenizes and POS tags many strings in one pass.
+# strings - The strings to tag
+# Returns a list of (word, tag) pair lists, one per string.
+def pos_tag_all(strings):
+    if not strings:
+        return []
+    _import_nltk()
+    profile = profiling.current
+    if profile is not None:
+        started = time.perf_counter()
+    try:
+        tags = [_tag(tokenize(string)) for string in strings]
+    except LookupError as e:
+        raise LookupError(_MISSING_MODELS % e) from None
+    if profile is not None:
+        profile.tagger_calls += 1
+        profile.tagger_strings += len(strings)
+        profile.tagger_seconds += time.perf_counter() - started
+    return tags
 
 # Define a grammar.
 # TODO: I basically made this up as I went based on a high school knowledge of
@@ -21,7 +157,7 @@ nltk.download('averaged_perceptron_tagger')
 #       At some point, we should allow commas to replace repeated conjunctions.
 #       NLTK's tagging is really bad at confusing helping verbs for gerunds.
 _verbs = ["VB", "VBD", "VBP", "VBZ"]
-_grammar = nltk.CFG.fromstring("""
+_grammar_rules = """
  Root -> NounP VerbP | Root 'CC' Root | NounP | VerbP | 'UH'
  InfP -> 'TO' VerbP
 NounP -> NounP ConjW NounP | AdjP NounP | NounP AdjP | InfP | GerP | NounW
@@ -37,7 +173,34 @@ VerbW -> %s
  AdvW -> 'RB' | 'RBR' | 'RBS' | 'MD'
 PartW -> 'VBG' | 'VBN'
 ConjW -> 'CC' | ','
-""" % " | ".join(["'%s'" % verb for verb in _verbs]))
+""" % " | ".join(["'%s'" % verb for verb in _verbs])
+
+
+# Returns the grammar, building it on first use.
+_grammar = None
+def grammar():
+    global _grammar
+    if _grammar is None:
+        _grammar = _import_nltk().CFG.fromstring(_grammar_rules)
+    return _grammar
+
+
+# Optionally backs _parse_memo with an on-disk cache shared across runs.
+_disk_cache = None
+_grammar_hashes = {}
+def use_disk_cache(path, max_bytes=64 * 1024 * 1024):
+    global _disk_cache
+    _disk_cache = parse_cache.DiskParseCache(path, max_bytes)
+
+
+# Returns counts of the work parse has done in this process: on-disk cache
+#  hits and misses, and parses that fell back to shallow_parse.
+def stats():
+    counts = {"cache_hits": 0, "cache_misses": 0, "fallbacks": _fallbacks}
+    if _disk_cache is not None:
+        counts["cache_hits"] = _disk_cache.hits
+        counts["cache_misses"] = _disk_cache.misses
+    return counts
 
 
 # Tags and parses a string using a CFG.
@@ -51,77 +214,283 @@ def parse(string, cfg):
     #  us to artificially indicate that a string has a particular parse tree.
     global _parse_memo
 
+    profile = profiling.current
     if string in _parse_memo:
+        if profile is not None:
+            profile.memo_hits += 1
         return _parse_memo[string]
     else:
-        tags = nltk.pos_tag(nltk.word_tokenize(string))
-        tree = next(nltk.ChartParser(cfg).parse([tag[1] for tag in tags]),
-                    None)
+        if profile is not None:
+            profile.memo_misses += 1
+            started = time.perf_counter()
+        cached = _disk_cache_get(string, cfg)
+        if cached is not None:
+            _parse_memo[string] = cached
+            return cached
+
+        tags = pos_tag(string)
+        tree = parse_tags(tuple(tag[1] for tag in tags), cfg)
         _parse_memo[string] = (tree, tags)
+        _disk_cache_put(string, cfg, (tree, tags))
+        if profile is not None:
+            profile.memo_size = len(_parse_memo)
+            profile.add_phrase(string, time.perf_counter() - started)
         # print("Parsing \"%s\"..." % string)
         # print(tree)
         return (tree, tags)
 
 
+# Tags and parses many strings at once, as parse would one by one.
+# The tagger has a large per-call overhead, so tagging every new string in a
+#  single pass is much cheaper. Results go into the memo for parse to find.
+# strings - The strings to parse
+# cfg - The CFG with which to parse the strings
+def parse_all(strings, cfg):
+    global _parse_memo
+
+    profile = profiling.current
+    pending = []
+    unique_strings = dict.fromkeys(strings)
+    misses = 0
+    for string in unique_strings:
+        if string not in _parse_memo:
+            misses += 1
+            cached = _disk_cache_get(string, cfg)
+            if cached is not None:
+                _parse_memo[string] = cached
+            else:
+                pending.append(string)
+    if profile is not None:
+        profile.memo_misses += misses
+        profile.memo_hits += len(unique_strings) - misses
+        started = time.perf_counter()
+
+    all_tags = pos_tag_all(pending)
+    if profile is not None and pending:
+        # Strings are tagged together, so each gets an equal share of the time
+        tag_share = (time.perf_counter() - started) / len(pending)
+    for string, tags in zip(pending, all_tags):
+        if profile is not None:
+            started = time.perf_counter()
+        tree = parse_tags(tuple(tag[1] for tag in tags), cfg)
+        _parse_memo[string] = (tree, tags)
+        _disk_cache_put(string, cfg, (tree, tags))
+        if profile is not None:
+            profile.add_phrase(string, tag_share + time.perf_counter() - started)
+    if profile is not None:
+        profile.memo_size = len(_parse_memo)
+
+
+# Looks a string's parse up in the on-disk cache, if there is one.
+# Returns the (tree, tags) pair or None.
+def _disk_cache_get(string, cfg):
+    if _disk_cache is None:
+        return None
+    if cfg not in _grammar_hashes:
+        _grammar_hashes[cfg] = parse_cache.grammar_hash(cfg)
+    return _disk_cache.get(_grammar_hashes[cfg], string)
+
+
+# Stores a string's parse in the on-disk cache, if there is one.
+def _disk_cache_put(string, cfg, value):
+    if _disk_cache is not None:
+        _disk_cache.put(_grammar_hashes[cfg], string, value)
+
+
+# Parses a POS tag sequence using a CFG.
+# The grammar's terminals are tags, so many different strings share a parse.
+#  Those parses are memoized by tag sequence, keeping at most
+#  _TREE_MEMO_SIZE of the most recently used ones.
+# The grammar is ambiguous enough that long sequences can take a very long
+#  time to parse, so a parse that adds more than _PARSE_EDGE_BUDGET edges to
+#  its chart is abandoned in favor of shallow_parse.
+# tags - A tuple of POS tags
+# cfg - The CFG with which to parse the tags
+# Returns the first parse tree, or None if the tags could not be parsed.
+_TREE_MEMO_SIZE = 4096
+_PARSE_EDGE_BUDGET = 50000
+_tree_memo = OrderedDict()
+_parsers = {}
+_fallbacks = 0
+def parse_tags(tags, cfg):
+    profile = profiling.current
+    key = (tags, cfg)
+    if key in _tree_memo:
+        _tree_memo.move_to_end(key)
+        if profile is not None:
+            profile.tree_memo_hits += 1
+        return _tree_memo[key]
+
+    tree = _parse_tags_uncached(tags, cfg)
+    _tree_memo[key] = tree
+    if len(_tree_memo) > _TREE_MEMO_SIZE:
+        _tree_memo.popitem(last=False)
+    return tree
+
+
+# Parses a POS tag sequence as parse_tags does, without its memo.
+def _parse_tags_uncached(tags, cfg):
+    global _fallbacks
+
+    profile = profiling.current
+    # Compiling a grammar is done once; parses then yield the same first tree
+    #  nltk.ChartParser would.
+    if cfg not in _parsers:
+        _parsers[cfg] = cfg_parser.CompiledParser(cfg)
+    if profile is not None:
+        started = time.perf_counter()
+    try:
+        tree = _parsers[cfg].parse(tags, _PARSE_EDGE_BUDGET)
+    except cfg_parser.ParseBudgetExceeded:
+        _fallbacks += 1
+        tree = shallow_parse(tags)
+    if profile is not None:
+        profile.parser_calls += 1
+        profile.parser_seconds += time.perf_counter() - started
+    return tree
+
+
+# Classifies a POS tag sequence in linear time, for when the grammar is too
+#  slow. Everything before the first verb is chunked as the subject and
+#  everything from it on as the predicate.
+# tags - A tuple of POS tags
+# Returns a tree shaped like the grammar's Root -> NounP VerbP, Root -> NounP
+#  or Root -> VerbP trees.
+def shallow_parse(tags):
+    for index, tag in enumerate(tags):
+        if tag in _verbs:
+            break
+    else:
+        return nltk.tree.Tree("Root", [nltk.tree.Tree("NounP", list(tags))])
+
+    verb_p = nltk.tree.Tree("VerbP", list(tags[index:]))
+    if index == 0:
+        return nltk.tree.Tree("Root", [verb_p])
+    return nltk.tree.Tree("Root", [nltk.tree.Tree("NounP", list(tags[:index])),
+                                   verb_p])
+
+
+# A phrase built by combining other phrases.
+# Combining phrases one after another would otherwise copy ever longer
+#  strings and trees, so a Phrase only keeps references to the pieces it was
+#  built from. Its text is rendered when asked for, and its tree shares its
+#  pieces' subtrees, which are never modified.
+class Phrase:
+    __slots__ = ("tree", "_pieces", "_text")
+
+    # pieces - The strings and Phrases whose texts, in order, make up its text
+    # tree - Its parse tree, or None to parse its text when it's needed
+    def __init__(self, pieces, tree):
+        self.tree = tree
+        self._pieces = pieces
+        self._text = None
+
+    def __str__(self):
+        if self._text is None:
+            self._text = self.render()
+        return self._text
+
+    # Returns its text, without keeping it.
+    def render(self):
+        return "".join(_flatten(self))
+
+
+# Walks a Phrase's pieces without recursion, since a long block nests
+#  Phrases as deeply as it has statements.
+# phrase - The Phrase to walk
+# Yields the strings that make up its text, in order.
+def _flatten(phrase):
+    stack = [phrase]
+    while stack:
+        piece = stack.pop()
+        if isinstance(piece, Phrase):
+            if piece._text is not None:
+                yield piece._text
+            else:
+                stack.extend(reversed(piece._pieces))
+        else:
+            yield piece
+
+
+# Tags and parses a string or Phrase.
+# Returns a pair containing its parse tree (or None) and its POS tags. A
+#  Phrase with a tree is never looked at any further, so its tags aren't
+#  worked out; None stands in for them. One without a tree is tagged and
+#  parsed like the string it stands for, but its text, tags and tree aren't
+#  memoized: they're only needed once, by the concat it's passed to next.
+def _parse_phrase(phrase):
+    if isinstance(phrase, Phrase):
+        if phrase.tree is not None:
+            return (phrase.tree, None)
+        tags = pos_tag(phrase.render())
+        return (_parse_tags_uncached(tuple(tag[1] for tag in tags), grammar()),
+                tags)
+    return parse(phrase, grammar())
+
+
 # Preprocesses strings, greedily combining pairs.
 # strings - A list of strings
-# Returns the preprocessed list of strings
+# Returns the preprocessed list of strings and Phrases
 def preproc(strings):
+    # Everything non-empty gets parsed once there are two strings to combine,
+    #  so tag them all together up front.
+    phrases = [string for string in strings if string.strip() != ""]
+    if len(phrases) > 1:
+        parse_all(phrases, grammar())
     return preproc_clauses(preproc_phrases(strings))
 
 
 # Preprocesses strings, greedily combining "noun-verb" pairs.
-# strings - A list of strings
-# Returns the preprocessed list of strings
+# strings - A list of strings and Phrases
+# Returns the preprocessed list of strings and Phrases
 def preproc_clauses(strings):
-    global _grammar, _parse_memo
+    ret_strs = []
+    index = 0
+    while index < len(strings) - 1:
+        if isinstance(strings[index], str) and strings[index].strip() == "":
+            return ret_strs + preproc_phrases(strings[index + 1:])
 
-    if len(strings) < 2:
-        return strings
-    elif strings[0].strip() == "":
-        return preproc_phrases(strings[1:])
-    else:
-        ind_tree = parse(strings[0], _grammar)
-        dep_tree = parse(strings[1], _grammar)
+        ind_tree = _parse_phrase(strings[index])
+        dep_tree = _parse_phrase(strings[index + 1])
 
         if is_noun_phrase(*ind_tree) and is_verb_phrase(*dep_tree):
-            # print("Combining \"%s\" and \"%s\"..." % (strings[0], strings[1]))
-            string = "%s %s" % (strings[0], strings[1])
-
-            # Artificially instruct parse how to handle this new string.
-            _parse_memo[string] = (
+            # print("Combining \"%s\" and \"%s\"..." % (strings[index], strings[index + 1]))
+            ret_strs.append(Phrase(
+                (strings[index], " ", strings[index + 1]),
                 nltk.tree.Tree("Root", [
                     nltk.tree.Tree("NounP", [ind_tree[0][0] if ind_tree[0]
                                              else ind_tree[1]]),
                     nltk.tree.Tree("VerbP", [dep_tree[0][0] if dep_tree[0]
                                              else dep_tree[1]])
-                ]),
-                ind_tree[1] + dep_tree[1])
-            return [string] + preproc_clauses(strings[2:])
+                ])))
+            index += 2
         else:
-            return [strings[0]] + preproc_clauses(strings[1:])
+            ret_strs.append(strings[index])
+            index += 1
+
+    ret_strs.extend(strings[index:])
+    return ret_strs
 
 
 # Preprocesses strings, greedily combining "noun-noun" and "verb-verb" pairs.
+# A combined pair stays at the front, so it may absorb the strings after it.
 # strings - A list of strings
-# Returns the preprocessed list of strings
+# Returns the preprocessed list of strings and Phrases
 def preproc_phrases(strings):
-    global _grammar, _parse_memo
+    ret_strs = []
+    head = None
+    for next_str in strings:
+        if head is None or isinstance(head, str) and head.strip() == "":
+            head = next_str
+            continue
 
-    if len(strings) < 2:
-        return strings
-    elif strings[0].strip() == "":
-        return preproc_phrases(strings[1:])
-    else:
-        ind_tree = parse(strings[0], _grammar)
-        dep_tree = parse(strings[1], _grammar)
+        ind_tree = _parse_phrase(head)
+        dep_tree = _parse_phrase(next_str)
 
         if is_noun_phrase(*ind_tree) and is_noun_phrase(*dep_tree):
-            # print("Combining \"%s\" and \"%s\"..." % (strings[0], strings[1]))
-            string = "%s and %s" % (strings[0], strings[1])
-
-            # Artificially instruct parse how to handle this new string.
-            _parse_memo[string] = (
+            # print("Combining \"%s\" and \"%s\"..." % (head, next_str))
+            head = Phrase(
+                (head, " and ", next_str),
                 nltk.tree.Tree("Root", [
                     nltk.tree.Tree("NounP", [
                         nltk.tree.Tree("NounP", [ind_tree[0][0] if ind_tree[0]
@@ -130,15 +499,11 @@ def preproc_phrases(strings):
                         nltk.tree.Tree("NounP", [dep_tree[0][0] if dep_tree[0]
                                                  else dep_tree[1]])
                     ])
-                ]),
-                ind_tree[1] + [("and", "CC")] + dep_tree[1])
-            return preproc_phrases([string] + strings[2:])
+                ]))
         elif is_verb_phrase(*ind_tree) and is_verb_phrase(*dep_tree):
-            # print("Combining \"%s\" and \"%s\"..." % (strings[0], strings[1]))
-            string = "%s and %s" % (strings[0], strings[1])
-
-            # Artificially instruct parse how to handle this new string.
-            _parse_memo[string] = (
+            # print("Combining \"%s\" and \"%s\"..." % (head, next_str))
+            head = Phrase(
+                (head, " and ", next_str),
                 nltk.tree.Tree("Root", [
                     nltk.tree.Tree("VerbP", [
                         nltk.tree.Tree("VerbP", [ind_tree[0][0] if ind_tree[0]
@@ -147,93 +512,83 @@ def preproc_phrases(strings):
                         nltk.tree.Tree("VerbP", [dep_tree[0][0] if dep_tree[0]
                                                  else dep_tree[1]])
                     ])
-                ]),
-                ind_tree[1] + [("and", "CC")] + dep_tree[1])
-            return preproc_phrases([string] + strings[2:])
+                ]))
         else:
-            return [strings[0]] + preproc_phrases(strings[1:])
+            ret_strs.append(head)
+            head = next_str
+
+    if head is not None:
+        ret_strs.append(head)
+    return ret_strs
 
 
 # Combines two strings.
-# ind_str - The more significant of two strings
-# dep_str - The less significant of two strings
-# Returns a combination of the two strings.
+# ind_str - The more significant of two strings (or Phrases)
+# dep_str - The less significant of two strings (or Phrases)
+# Returns a combination of the two, usually as a Phrase. Use str() on the end
+#  result of a series of concats to get the paragraph.
 def concat(ind_str, dep_str):
-    global _debug, _grammar
+    global _debug
 
     # If either string is empty, return the other.
-    if ind_str == "":
+    if isinstance(ind_str, str) and ind_str == "":
         return dep_str
-    elif dep_str == "":
+    elif isinstance(dep_str, str) and dep_str == "":
         return ind_str
     else:
         # Construct parse trees for the two strings.
-        ind_tree = parse(ind_str, _grammar)
-        dep_tree = parse(dep_str, _grammar)
+        ind_tree = _parse_phrase(ind_str)
+        dep_tree = _parse_phrase(dep_str)
 
         if is_clause(*ind_tree):
             if is_clause(*dep_tree):
                 # Both are clauses.
-                string = "%s\n%s" % (ind_str, dep_str)
-
-                # Artificially instruct parse how to handle this new string.
-                _parse_memo[string] = (
+                return Phrase(
+                    (ind_str, "\n", dep_str),
                     nltk.tree.Tree("Root", [
                         ind_tree[0],
                         "CC",
                         dep_tree[0]
-                    ]),
-                    ind_tree[1] + [("and", "CC")] + dep_tree[1])
-                return string
+                    ]))
             else:
                 # The first is a clause, the second is not.
-                string = "%s before %s" % (ind_str, dep_str)
-
-                # Artificially instruct parse how to handle this new string.
-                tree = nltk.tree.Tree("Root", [
-                    deepcopy(ind_tree[0][0]),
-                    nltk.tree.Tree("VerbP", [
-                        deepcopy(ind_tree[0][1]),
-                        nltk.tree.Tree("AdvP", [
-                            nltk.tree.Tree("PrepP", [
-                                "IN",
-                                deepcopy(dep_tree[0][0] if dep_tree[0]
-                                         else dep_tree[1])
+                return Phrase(
+                    (ind_str, " before ", dep_str),
+                    nltk.tree.Tree("Root", [
+                        ind_tree[0][0],
+                        nltk.tree.Tree("VerbP", [
+                            ind_tree[0][1],
+                            nltk.tree.Tree("AdvP", [
+                                nltk.tree.Tree("PrepP", [
+                                    "IN",
+                                    dep_tree[0][0] if dep_tree[0]
+                                    else dep_tree[1]
+                                ])
                             ])
                         ])
-                    ])
-                ])
-
-                _parse_memo[string] = (tree, ind_tree[1] + [("before", "IN")]
-                                             + dep_tree[1])
-                return string
+                    ]))
         else:
             if is_clause(*dep_tree):
                 # The second is a clause, the first is not.
-                string = "%s after %s" % (dep_str, ind_str)
-
-                # Artificially instruct parse how to handle this new string.
-                tree = nltk.tree.Tree("Root", [
-                    deepcopy(dep_tree[0][0]),
-                    nltk.tree.Tree("VerbP", [
-                        deepcopy(dep_tree[0][1]),
-                        nltk.tree.Tree("AdvP", [
-                            nltk.tree.Tree("PrepP", [
-                                "IN",
-                                deepcopy(ind_tree[0][0] if ind_tree[0]
-                                         else ind_tree[1])
+                return Phrase(
+                    (dep_str, " after ", ind_str),
+                    nltk.tree.Tree("Root", [
+                        dep_tree[0][0],
+                        nltk.tree.Tree("VerbP", [
+                            dep_tree[0][1],
+                            nltk.tree.Tree("AdvP", [
+                                nltk.tree.Tree("PrepP", [
+                                    "IN",
+                                    ind_tree[0][0] if ind_tree[0]
+                                    else ind_tree[1]
+                                ])
                             ])
                         ])
-                    ])
-                ])
-
-                _parse_memo[string] = (tree, dep_tree[1] + [("after", "IN")]
-                                             + ind_tree[1])
-                return string
+                    ]))
             else:
                 # Neither is a clause.
                 # TODO: This should never come up after preprocessing.
-                return "%s and %s" % (ind_str, dep_str)
+                return Phrase((ind_str, " and ", dep_str), None)
 
 
 # Helps determine whether or not a string is a clause.
@@ -277,16 +632,29 @@ def is_verb_phrase(tree, tags):
         return reduce(lambda p, tag: p or tag[1] in _verbs, tags, False)
 
 
+# Combines lines into a paragraph.
+# TODO: This combines sentences linearly, one after the other. For better
+#       results, suggest combining in an order informed by the AST.
+# strings - A list of strings, one per line
+# Returns the paragraph.
+def describe(strings):
+    strings = preproc([string.strip() for string in strings])
+    return str(reduce(concat, strings, ""))
+
+
+# Loads the tagger's models and builds the grammar and its parser ahead of the
+#  first real string, so that a long-running process answers that one quickly.
+def warm_up():
+    parse_tags(tuple(tag[1] for tag in pos_tag("warm up")), grammar())
+
+
 def main(argv):
-    # TODO: This combines sentences linearly, one after the other. For better
-    #       results, suggest combining in an order informed by the AST.
     if argv[1] == "-":
-        strings = preproc([string.strip() for string in sys.stdin])
+        paragraph = describe(sys.stdin)
     else:
         with open(argv[1], "r") as string_file:
-            strings = preproc([string.strip() for string in string_file])
+            paragraph = describe(string_file)
 
-    paragraph = reduce(concat, strings, "")
     print("\n%s" % paragraph)
 
 
@@ -0,0 +1,142 @@
+# On-disk caches of magic_nlp.parse results and of whole function
+#  translations, shared across runs and processes.
+# Backed by SQLite so several batch workers can read and write it at once.
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+
+import compact_ast
+
+# How many inserts to allow between checks of the cache's total size.
+_EVICT_INTERVAL = 100
+
+
+# Computes the key component identifying a grammar. Cached results are only
+#  valid for the grammar (and tagger) that produced them.
+# cfg - The CFG used to parse
+# Returns a hex digest of the grammar and the NLTK version.
+def grammar_hash(cfg):
+    import nltk
+    return hashlib.sha1(("%s\n%s" % (nltk.__version__, cfg)).encode()) \
+                  .hexdigest()
+
+
+# AST fields left out of subtree_hash: node ids and source offsets, and the
+#  fields that refer to other nodes or source units by id. They change
+#  whenever code above a function (or another file of a project) does, and
+#  the translator never reads them.
+_UNHASHED_KEYS = frozenset(['id', 'src', 'referencedDeclaration', 'scope',
+                            'overloadedDeclarations', 'assignments',
+                            'functionReturnParameters', 'superFunction',
+                            'typeDescriptions', 'baseFunctions',
+                            'contractDependencies', 'linearizedBaseContracts',
+                            'exportedSymbols', 'sourceUnit'])
+_END_OBJECT = object()
+_END_ARRAY = object()
+
+
+# Computes a content hash of an AST subtree, ignoring the _UNHASHED_KEYS.
+#  Walks the tree with an explicit stack, so any depth can be hashed.
+# js - The subtree, as decoded from solc json or as compact_ast nodes
+# Returns a hex digest.
+def subtree_hash(js):
+    digest = hashlib.sha1()
+    stack = [js]
+    while stack:
+        item = stack.pop()
+        if item is _END_OBJECT:
+            digest.update(b"}")
+        elif item is _END_ARRAY:
+            digest.update(b"]")
+        elif isinstance(item, (dict, compact_ast.Node)):
+            digest.update(b"{")
+            stack.append(_END_OBJECT)
+            for key in sorted(item, reverse=True):
+                if key not in _UNHASHED_KEYS:
+                    stack.append(item[key])
+                    stack.append(key)
+        elif isinstance(item, list):
+            digest.update(b"[")
+            stack.append(_END_ARRAY)
+            stack.extend(reversed(item))
+        else:
+            digest.update(repr(item).encode())
+            digest.update(b",")
+    return digest.hexdigest()
+
+
+class DiskParseCache:
+    # path - The SQLite database file, created if missing
+    # max_bytes - Evict the oldest entries once the cached results exceed this
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._inserts = 0
+
+    # Opens (or reopens, after a fork) this thread's connection. SQLite
+    #  connections can only be used by the thread that opened them.
+    def _connection(self):
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS parses ("
+                         "grammar TEXT, string TEXT, value BLOB, "
+                         "size INTEGER, PRIMARY KEY (grammar, string))")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    # Looks up a cached (tree, tags) pair.
+    # Returns the pair, or None on a miss.
+    def get(self, grammar, string):
+        row = self._connection().execute(
+            "SELECT value FROM parses WHERE grammar = ? AND string = ?",
+            (grammar, string)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    # Stores a (tree, tags) pair, evicting old entries if the cache is full.
+    #  Values nested too deeply to pickle (the trees of very long phrases)
+    #  aren't stored.
+    def put(self, grammar, string, value):
+        try:
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            return
+        conn = self._connection()
+        conn.execute("INSERT OR IGNORE INTO parses VALUES (?, ?, ?, ?)",
+                     (grammar, string, blob, len(blob)))
+        self._inserts += 1
+        if self._inserts % _EVICT_INTERVAL == 0:
+            self.evict()
+
+    # Deletes the oldest entries until the cache is back under 90% of
+    #  max_bytes.
+    def evict(self):
+        conn = self._connection()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM parses") \
+                    .fetchone()[0]
+        excess = total - self.max_bytes * 9 // 10
+        if total <= self.max_bytes or excess <= 0:
+            return
+        last_rowid = None
+        for rowid, size in conn.execute(
+                "SELECT rowid, size FROM parses ORDER BY rowid"):
+            last_rowid = rowid
+            excess -= size
+            if excess <= 0:
+                break
+        conn.execute("DELETE FROM parses WHERE rowid <= ?", (last_rowid,))
+
+    # Returns this process's hit and miss counts.
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
@@ -2,408 +2,1328 @@
 # Eric LaBouve (elabouve@calpoly.edu)
 # CSC 570, Winter '18
 
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
 import json
+import mmap
+import os
 import sys
 import re
+import threading
+import time
 
-from functools import reduce
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial, reduce
+import compact_ast
 import magic_nlp
+import parse_cache
+import pipeline
+import profiling
+import solc_ast
 
 binary_op_to_english = {"*":" multiplied by ", "/":" divided by ", "%":" remainder of ", "+":" added to ", "-":" subtracted by ", "&&":" and ", "||":" or ", ">":" is greater than ", "<":" is less than ", ">=":" is greater than or equal to ", "<=":" is less than or equal to ", "==":" is equal to ", "!=":" is not equal to "}
 unary_op_to_english = {"++":" add one to ", "--":" remove one from ", "!":" not ", "-":" negative of "}
 assignment_op_to_english = {"=":" is ", "+=":" gains ", "-=":" loses ", "*=":" multiplied by ", "/=":" divided by ", "%=":" moded by "}
 msg_members_to_english = {"data":" the complete calldata ", "gas":" the remaining money in this function ", "sender":" the money sender ", "sig":" the function the sender activated ", "value":" the money sent by the sender "}
 
-msg_found = False
-found_first_function = False # Dont comment code above the first function
-                             # Code above first function are variable and struct definitions
-in_for_loop_header = False
-
-def parse_var_names(_str):
-    """Separate any snake_case or CamelCase words before adding to description"""
-    global found_first_function
-    if found_first_function:
-        space_sep_str = re.sub('([A-Z]+)', r' \1', _str).lower()
-        # space_sep_str = re.sub('_', r' \1', space_sep_str).lower()
-        space_sep_str = re.sub('_', ' ', space_sep_str).lower()
-        return " " + space_sep_str + " "
-    else:
-        return ""
+# Runs of spaces before an apostrophe or comma, and other runs of 2+ spaces
+_space_runs = re.compile(r" +(?=[',])|( ) +")
+_capitals = re.compile('([A-Z]+)')
+_paragraph_breaks = re.compile("[\n]{2,}")
 
 def dedupe_spaces(description):
     """Remove any extra spaces between words
        Called from ExpressionStatement nodes"""
-    # Remove any extra spaces
-    single_space_sep_desc = re.sub(' +', ' ', description)
-    # Smoosh together apostrophes and commas
-    single_space_sep_desc = re.sub(' \'', '\'', single_space_sep_desc)
-    single_space_sep_desc = re.sub(' ,', ',', single_space_sep_desc)
-    return single_space_sep_desc
-
-def parse_Literal(js):
-    """A literal value, ex 42"""
-    #print("In Literal: kind=" + js['kind'] + " value=" + js['value'])
-    return parse_var_names(js['value'])
-
-def parse_Continue(js):
-    """Continue key word"""
-    #print("In Continue")
-    return "do nothing"
-
-def parse_PlaceholderStatement(js):
-    #print("In PlaceholderStatement")
-    return ""
-
-def parse_ElementaryTypeNameExpression(js):
-    """Contains type descriptions"""
-    #print("In ElementaryTypeNameExpression")
-    return ""
-
-def parse_Identifier(js):
-    """Name for a variable. Can be found inside a MemberAccess"""
-    #print("In Identifier: name=" + js['name'])
-    global msg_found
-    if js['name'] == 'msg':
-        msg_found = True
+    # Remove any extra spaces and smoosh together apostrophes and commas,
+    # in one pass
+    return _space_runs.sub(r"\1", description)
+
+@lru_cache(maxsize=4096)
+def split_var_name(_str):
+    """Separate any snake_case or CamelCase words"""
+    space_sep_str = _capitals.sub(r' \1', _str).lower()
+    return " " + space_sep_str.replace('_', ' ') + " "
+
+class Translator:
+    """Translates one solc AST into English.
+       All state a translation needs lives on the instance, so separate
+       Translators (e.g. one per thread) can run at the same time.
+       Given an executor (a process pool), contracts send their functions
+       and modifiers to it and reassemble the results in order.
+       Given a FunctionFilter, contracts only translate the functions it
+       selects"""
+
+    def __init__(self, executor=None, function_filter=None):
+        self.executor = executor
+        self.function_filter = function_filter
+        self.msg_found = False
+        self.found_first_function = False # Dont comment code above the first function
+                                          # Code above first function are variable and struct definitions
+        self.in_for_loop_header = False
+        self.unrecognized_nodes = 0
+
+    def parse_var_names(self, _str):
+        """Separate any snake_case or CamelCase words before adding to description"""
+        if self.found_first_function:
+            return split_var_name(_str)
+        else:
+            return ""
+
+    def parse_Literal(self, js):
+        """A literal value, ex 42"""
+        #print("In Literal: kind=" + js['kind'] + " value=" + js['value'])
+        return self.parse_var_names(js['value'])
+
+    def parse_Continue(self, js):
+        """Continue key word"""
+        #print("In Continue")
+        return "do nothing"
+
+    def parse_PlaceholderStatement(self, js):
+        #print("In PlaceholderStatement")
         return ""
-    else:
-        return parse_var_names(js['name'])
-
-def parse_MemberAccess(js):
-    """Index into a structure to extract a value"""
-    #print("In MemberAccess: memberName=" + js['memberName'])
-    global msg_found
-    ret_str = parse(js['expression'])
-    if msg_found:
-        ret_str += parse_var_names(msg_members_to_english[js['memberName']])
-        msg_found = False
-    else:
-        ret_str += parse_var_names('\'s ' + js['memberName'] + ' ')
-    return ret_str
-
-def parse_IndexAccess(js):
-    """Index into an array, ex: arr[3]"""
-    #print("In IndexAccess")
-    return parse(js['baseExpression']) \
-           + parse_var_names(" list at ") \
-           + parse(js['indexExpression'])
-
-def parse_BinaryOperation(js):
-    """An operator that acts on two values"""
-    #print("In BinaryOperation: operator:" + js['operator'])
-    return parse(js['leftExpression']) \
-           + parse_var_names(binary_op_to_english[js['operator']]) \
-           + parse(js['rightExpression'])
-
-def parse_UnaryOperation(js):
-    """An operator that acts on one value"""
-    #print("In UnaryOperation: operator: " + js['operator'])
-    return parse_var_names(unary_op_to_english[js['operator']]) \
-           + parse(js['subExpression'])
-
-def parse_Assignment(js):
-    """Contains nodes to the left and right of the operator"""
-    #print("In Assignment: operator:" + js['operator'])
-    return parse(js['leftHandSide']) \
-           + parse_var_names(assignment_op_to_english[js['operator']]) \
-           + parse(js['rightHandSide'])
-
-def parse_ExpressionStatement(js):
-    """Node that indicates the line is an expression, such as an Assignment"""
-    #print("In ExpressionStatement")
-    return dedupe_spaces(parse(js['expression']))
-
-def parse_IfStatement(js):
-    """Declaration and parameters for an if statement
-        May or may not have an else statement"""
-    #print("In IfStatement")
-    cond_str = parse(js['condition'])
-
-    ret_str = "\nIf " + cond_str + " then do "
-    ret_str += parse(js['trueBody'])
-    ret_str += "\nThis only happens if " + cond_str
-
-    if js['falseBody'] != None:
-        ret_str += "\nIf it is not the case that " + cond_str
-        ret_str += parse(js['falseBody'])
-        ret_str += "\nThis only happens if it is not the case that " + cond_str
-
-    return dedupe_spaces(ret_str)
-
-def parse_WhileStatement(js):
-    """Declaration and parameters for a while statement"""
-    #print("In WhileStatement")
-    return "\nAs long as " \
-           + parse(js['condition']) \
-           + " do\n" \
-           + parse(js['body']) \
-           + " and this continues as long as " \
-           + parse(js['condition']) + "\n"
-
-def parse_ForStatement(js):
-    """Declaration and parameters for a for statement"""
-    #print("In ForStatement")
-    global in_for_loop_header
-
-    in_for_loop_header = True
-    ret_str = "\nSet "
-    ret_str += parse(js['initializationExpression'])
-    ret_str += "\nThen as long as "
-    ret_str += parse(js['condition'])
-    ret_str += " do\n"
-
-    in_for_loop_header = False
-    ret_str += parse(js['body'])
-    ret_str += "\nEach time that happens "
-
-    in_for_loop_header = True
-    ret_str += parse(js['loopExpression'])
-    ret_str += " and this continues as long as "
-    ret_str += parse(js['condition'])
-
-    return dedupe_spaces(ret_str) + "\n"
-
-def parse_Block(js):
-    """Contains a list of statements and is widely used to organize
-        other nodes such as FunctionDefinitions"""
-    #print("In Block")
-    ret_str = ""
-    ret_strs = []
-    for js_expr in js['statements']:
-        if js_expr['nodeType'] != 'IfStatement' \
-           and js_expr['nodeType'] != 'ForStatement' \
-           and js_expr['nodeType'] != 'WhileStatement':
-            ret_strs.append(dedupe_spaces(parse(js_expr).strip()))
+
+    def parse_ElementaryTypeNameExpression(self, js):
+        """Contains type descriptions"""
+        #print("In ElementaryTypeNameExpression")
+        return ""
+
+    def parse_Identifier(self, js):
+        """Name for a variable. Can be found inside a MemberAccess"""
+        #print("In Identifier: name=" + js['name'])
+        if js['name'] == 'msg':
+            self.msg_found = True
+            return ""
         else:
+            return self.parse_var_names(js['name'])
+
+    def parse_MemberAccess(self, js):
+        """Index into a structure to extract a value"""
+        #print("In MemberAccess: memberName=" + js['memberName'])
+        ret_strs = [(yield js['expression'])]
+        if self.msg_found:
+            ret_strs.append(self.parse_var_names(msg_members_to_english[js['memberName']]))
+            self.msg_found = False
+        else:
+            ret_strs.append(self.parse_var_names('\'s ' + js['memberName'] + ' '))
+        return ret_strs
+
+    def parse_IndexAccess(self, js):
+        """Index into an array, ex: arr[3]"""
+        #print("In IndexAccess")
+        return [(yield js['baseExpression']),
+                self.parse_var_names(" list at "),
+                (yield js['indexExpression'])]
+
+    def parse_BinaryOperation(self, js):
+        """An operator that acts on two values"""
+        #print("In BinaryOperation: operator:" + js['operator'])
+        return [(yield js['leftExpression']),
+                self.parse_var_names(binary_op_to_english[js['operator']]),
+                (yield js['rightExpression'])]
+
+    def parse_UnaryOperation(self, js):
+        """An operator that acts on one value"""
+        #print("In UnaryOperation: operator: " + js['operator'])
+        return [self.parse_var_names(unary_op_to_english[js['operator']]),
+                (yield js['subExpression'])]
+
+    def parse_Assignment(self, js):
+        """Contains nodes to the left and right of the operator"""
+        #print("In Assignment: operator:" + js['operator'])
+        return [(yield js['leftHandSide']),
+                self.parse_var_names(assignment_op_to_english[js['operator']]),
+                (yield js['rightHandSide'])]
+
+    def parse_ExpressionStatement(self, js):
+        """Node that indicates the line is an expression, such as an Assignment"""
+        #print("In ExpressionStatement")
+        return dedupe_spaces((yield js['expression']))
+
+    def parse_IfStatement(self, js):
+        """Declaration and parameters for an if statement
+            May or may not have an else statement"""
+        #print("In IfStatement")
+        cond_str = (yield js['condition'])
+
+        ret_strs = ["\nIf ", cond_str, " then do ",
+                    (yield js['trueBody']),
+                    "\nThis only happens if ", cond_str]
+
+        if js['falseBody'] != None:
+            ret_strs += ["\nIf it is not the case that ", cond_str,
+                         (yield js['falseBody']),
+                         "\nThis only happens if it is not the case that ", cond_str]
+
+        return _Deduped(ret_strs)
+
+    def parse_WhileStatement(self, js):
+        """Declaration and parameters for a while statement"""
+        #print("In WhileStatement")
+        return ["\nAs long as ", (yield js['condition']), " do\n",
+                (yield js['body']),
+                " and this continues as long as ", (yield js['condition']), "\n"]
+
+    def parse_ForStatement(self, js):
+        """Declaration and parameters for a for statement"""
+        #print("In ForStatement")
+        self.in_for_loop_header = True
+        ret_strs = ["\nSet ", (yield js['initializationExpression']),
+                    "\nThen as long as ", (yield js['condition']), " do\n"]
+
+        self.in_for_loop_header = False
+        ret_strs += [(yield js['body']), "\nEach time that happens "]
+
+        self.in_for_loop_header = True
+        ret_strs += [(yield js['loopExpression']),
+                     " and this continues as long as ", (yield js['condition'])]
+
+        return [_Deduped(ret_strs), "\n"]
+
+    def parse_Block(self, js):
+        """Contains a list of statements and is widely used to organize
+            other nodes such as FunctionDefinitions"""
+        #print("In Block")
+        paragraphs = []
+        ret_strs = []
+        for js_expr in js['statements']:
+            if js_expr['nodeType'] != 'IfStatement' \
+               and js_expr['nodeType'] != 'ForStatement' \
+               and js_expr['nodeType'] != 'WhileStatement':
+                ret_strs.append(dedupe_spaces(join_pieces((yield js_expr)).strip()))
+            else:
+                ret_strs = magic_nlp.preproc(ret_strs)
+                paragraphs.append(str(reduce(magic_nlp.concat, ret_strs, "")))
+                ret_strs = []
+                paragraphs.append((yield js_expr))
+
+        if ret_strs:
             ret_strs = magic_nlp.preproc(ret_strs)
-            ret_str += reduce(magic_nlp.concat, ret_strs, "")
-            ret_strs = []
-            ret_str += parse(js_expr)
-
-    if ret_strs:
-        ret_strs = magic_nlp.preproc(ret_strs)
-        ret_str += reduce(magic_nlp.concat, ret_strs, "")
-    return ret_str
-
-def parse_TupleExpression(js):
-    """Indicates use of a tuple"""
-    #print("In TupleExpression")
-    ret_str = ""
-    for component in js['components']:
-        ret_str += parse(component)
-    return ret_str
-
-def parse_ArrayTypeName(js):
-    """The type for an array, ex int[]"""
-    #print("In ArrayTypeName")
-    return parse(js['baseType'])
-
-def parse_UserDefinedTypeName(js):
-    """Indicates declaring a new user defined enumeration type"""
-    #print("In UserDefinedTypeName: name=" + js['name'])
-    return ""
-
-def parse_EnumDefinition(js):
-    #print("In EnumDefinition: name=" + js['name'])
-    ret_str = ""
-    for member in js['members']:
-        ret_str += parse(member)
-    return ret_str
-
-def parse_EnumValue(js):
-    """Usage of an Enumeration Value"""
-    #print("In EnumValue: name=" + js['name'])
-    return ""
-
-def parse_StructDefinition(js):
-    """Definition for a new structure datatype"""
-    #print("In StructDefinition: name=" + js['name'])
-    ret_str = ""
-    for member in js['members']:
-        ret_str += parse(member)
-    return ret_str
-
-def parse_ParameterList(js):
-    """A list of parameters that may be passed to a function, constructor, etc"""
-    #print("In ParameterList")
-    ret_str = ""
-    for param in js['parameters']:
-        ret_str += parse(param)
-    return ret_str
-
-def parse_Return(js):
-    """Return statement from a function"""
-    #print("In Return")
-    if js['expression'] != None:
-        return parse(js['expression'])
-    else:
+            paragraphs.append(str(reduce(magic_nlp.concat, ret_strs, "")))
+        return paragraphs
+
+    def parse_TupleExpression(self, js):
+        """Indicates use of a tuple"""
+        #print("In TupleExpression")
+        ret_strs = []
+        for component in js['components']:
+            ret_strs.append((yield component))
+        return ret_strs
+
+    def parse_ArrayTypeName(self, js):
+        """The type for an array, ex int[]"""
+        #print("In ArrayTypeName")
+        return (yield js['baseType'])
+
+    def parse_UserDefinedTypeName(self, js):
+        """Indicates declaring a new user defined enumeration type"""
+        #print("In UserDefinedTypeName: name=" + js['name'])
         return ""
 
-def parse_FunctionCall(js):
-    """Contains all function calling params and values"""
-    #print("In FunctionCall")
-    ret_str = parse(js['expression'])
-    for arg in js['arguments']:
-        ret_str += parse(arg)
-    return ret_str
-
-def parse_FunctionDefinition(js):
-    """Indicates the top of a function definition"""
-    #print("In FunctionDefinition: name=" + js['name'] + " payable=" + str(js['payable']))
-    global found_first_function
-    found_first_function = True
-    return parse(js['body']) + "\n\n"
-
-def parse_ModifierDefinition(js):
-    """Definition for a modifier, like a wrapper function"""
-    #print("In ModifierDefinition: name=" + js['name'])
-    return parse(js['parameters']) + parse(js['body'])
-
-def parse_EventDefinition(js):
-    """Indicates the top of an event definition (like a wrapper function)"""
-    #print("In EventDefinition name=" + js['name'])
-    return parse(js['parameters'])
-
-def parse_ElementaryTypeName(js):
-    """Gives the type of an elementary type, ex byte32"""
-    #print("In ElementaryTypeName")
-    return ""
-
-def parse_Mapping(js):
-    """Indicates that we are declaring a mapping variable"""
-    #print("In Mapping")
-    return parse(js['keyType']) + parse(js['valueType'])
-
-def parse_VariableDeclarationStatement(js):
-    """Declare a list of variables. ex: i, j, k = 0;"""
-    #print("In VariableDeclarationStatement")
-    ret_str = ""
-    declarations_size = len(js['declarations'])
-    for declaration in js['declarations']:
-        ret_str += parse(declaration)
-        if declarations_size > 1:
-            ret_str += parse_var_names(' and ')
-        declarations_size -= 1
-    ret_str += parse_var_names(' is ')
-    if js['initialValue'] != None:
-        ret_str += parse(js['initialValue'])
-    else:
-        ret_str += parse_var_names(' default value ')
-    if not in_for_loop_header:
-        ret_str = dedupe_spaces(ret_str)
-    return ret_str
-
-def parse_VariableDeclaration(js):
-    """Contains one contract-wide variable declaration"""
-    #print("In VariableDeclaration: name=" + js['name'])
-    return parse_var_names(js['name'])
-
-def parse_ContractDefinition(js):
-    """Top of a contract"""
-    #print("In ContractDefinition: name=" + js['name'])
-    ret_str = ""
-    for js_node in js['nodes']:
-        ret_str += parse(js_node)
-    return ret_str
-
-def parse_PragmaDirective(js):
-    """Indicates the solidity type we are compiling with"""
-    #print("In PragmaDirective")
-    return ""
-
-def parse_SourceUnit(js):
-    """Top level node that holds all nodes"""
-    #print("In SourceUnit")
-    ret_str = ""
-    for js_node in js['nodes']:
-        ret_str += parse(js_node)
-    return ret_str
+    def parse_EnumDefinition(self, js):
+        #print("In EnumDefinition: name=" + js['name'])
+        ret_strs = []
+        for member in js['members']:
+            ret_strs.append((yield member))
+        return "".join(ret_strs)
 
-def parse(js):
-    """ Parses the input json tree to discover variable names """
-    # Determine the node type and execute node specific code
-    if js['nodeType'] == 'SourceUnit':
-        return parse_SourceUnit(js)
-    elif js['nodeType'] == 'PragmaDirective':
-        return parse_PragmaDirective(js)
-    elif js['nodeType'] == 'ContractDefinition':
-        return parse_ContractDefinition(js)
-    elif js['nodeType'] == 'VariableDeclaration':
-        return parse_VariableDeclaration(js)
-    elif js['nodeType'] == 'VariableDeclarationStatement':
-        return parse_VariableDeclarationStatement(js)
-    elif js['nodeType'] == 'Mapping':
-        return parse_Mapping(js)
-    elif js['nodeType'] == 'ElementaryTypeName':
-        return parse_ElementaryTypeName(js)
-    elif js['nodeType'] == 'EventDefinition':
-        return parse_EventDefinition(js)
-    elif js['nodeType'] == 'ModifierDefinition':
-        return parse_ModifierDefinition(js)
-    elif js['nodeType'] == 'FunctionDefinition':
-        return parse_FunctionDefinition(js)
-    elif js['nodeType'] == 'FunctionCall':
-        return parse_FunctionCall(js)
-    elif js['nodeType'] == 'Return':
-        return parse_Return(js)
-    elif js['nodeType'] == 'ParameterList':
-        return parse_ParameterList(js)
-    elif js['nodeType'] == 'StructDefinition':
-        return parse_StructDefinition(js)
-    elif js['nodeType'] == 'EnumDefinition':
-        return parse_EnumDefinition(js)
-    elif js['nodeType'] == 'EnumValue':
-        return parse_EnumValue(js)
-    elif js['nodeType'] == 'UserDefinedTypeName':
-        return parse_UserDefinedTypeName(js)
-    elif js['nodeType'] == 'ArrayTypeName':
-        return parse_ArrayTypeName(js)
-    elif js['nodeType'] == 'TupleExpression':
-        return parse_TupleExpression(js)
-    elif js['nodeType'] == 'Block':
-        return parse_Block(js)
-    elif js['nodeType'] == 'IfStatement':
-        return parse_IfStatement(js)
-    elif js['nodeType'] == 'ForStatement':
-        return parse_ForStatement(js)
-    elif js['nodeType'] == 'WhileStatement':
-        return parse_WhileStatement(js)
-    elif js['nodeType'] == 'ExpressionStatement':
-        return parse_ExpressionStatement(js)
-    elif js['nodeType'] == 'Assignment':
-        return parse_Assignment(js)
-    elif js['nodeType'] == 'UnaryOperation':
-        return parse_UnaryOperation(js)
-    elif js['nodeType'] == 'BinaryOperation':
-        return parse_BinaryOperation(js)
-    elif js['nodeType'] == 'IndexAccess':
-        return parse_IndexAccess(js)
-    elif js['nodeType'] == 'MemberAccess':
-        return parse_MemberAccess(js)
-    elif js['nodeType'] == 'Identifier':
-        return parse_Identifier(js)
-    elif js['nodeType'] == 'ElementaryTypeNameExpression':
-        return parse_ElementaryTypeNameExpression(js)
-    elif js['nodeType'] == 'PlaceholderStatement':
-        return parse_PlaceholderStatement(js)
-    elif js['nodeType'] == 'Continue':
-        return parse_Continue(js)
-    elif js['nodeType'] == 'Literal':
-        return parse_Literal(js)
-    else:
-        print("Node type not recognized: " + str(js['nodeType']))
+    def parse_EnumValue(self, js):
+        """Usage of an Enumeration Value"""
+        #print("In EnumValue: name=" + js['name'])
         return ""
 
+    def parse_StructDefinition(self, js):
+        """Definition for a new structure datatype"""
+        #print("In StructDefinition: name=" + js['name'])
+        ret_strs = []
+        for member in js['members']:
+            ret_strs.append((yield member))
+        return "".join(ret_strs)
+
+    def parse_ParameterList(self, js):
+        """A list of parameters that may be passed to a function, constructor, etc"""
+        #print("In ParameterList")
+        ret_strs = []
+        for param in js['parameters']:
+            ret_strs.append((yield param))
+        return "".join(ret_strs)
+
+    def parse_Return(self, js):
+        """Return statement from a function"""
+        #print("In Return")
+        if js['expression'] != None:
+            return (yield js['expression'])
+        else:
+            return ""
+
+    def parse_FunctionCall(self, js):
+        """Contains all function calling params and values"""
+        #print("In FunctionCall")
+        ret_strs = [(yield js['expression'])]
+        for arg in js['arguments']:
+            ret_strs.append((yield arg))
+        return ret_strs
+
+    def parse_FunctionDefinition(self, js):
+        """Indicates the top of a function definition"""
+        #print("In FunctionDefinition: name=" + js['name'] + " payable=" + str(js['payable']))
+        self.found_first_function = True
+        return (yield js['body']) + "\n\n"
+
+    def parse_ModifierDefinition(self, js):
+        """Definition for a modifier, like a wrapper function"""
+        #print("In ModifierDefinition: name=" + js['name'])
+        return (yield js['parameters']) + (yield js['body'])
+
+    def parse_EventDefinition(self, js):
+        """Indicates the top of an event definition (like a wrapper function)"""
+        #print("In EventDefinition name=" + js['name'])
+        return (yield js['parameters'])
+
+    def parse_ElementaryTypeName(self, js):
+        """Gives the type of an elementary type, ex byte32"""
+        #print("In ElementaryTypeName")
+        return ""
+
+    def parse_Mapping(self, js):
+        """Indicates that we are declaring a mapping variable"""
+        #print("In Mapping")
+        return (yield js['keyType']) + (yield js['valueType'])
+
+    def parse_VariableDeclarationStatement(self, js):
+        """Declare a list of variables. ex: i, j, k = 0;"""
+        #print("In VariableDeclarationStatement")
+        ret_strs = []
+        declarations_size = len(js['declarations'])
+        for declaration in js['declarations']:
+            ret_strs.append((yield declaration))
+            if declarations_size > 1:
+                ret_strs.append(self.parse_var_names(' and '))
+            declarations_size -= 1
+        ret_strs.append(self.parse_var_names(' is '))
+        if js['initialValue'] != None:
+            ret_strs.append((yield js['initialValue']))
+        else:
+            ret_strs.append(self.parse_var_names(' default value '))
+        ret_str = "".join(ret_strs)
+        if not self.in_for_loop_header:
+            ret_str = dedupe_spaces(ret_str)
+        return ret_str
+
+    def parse_VariableDeclaration(self, js):
+        """Contains one contract-wide variable declaration"""
+        #print("In VariableDeclaration: name=" + js['name'])
+        return self.parse_var_names(js['name'])
+
+    def parse_ContractDefinition(self, js):
+        """Top of a contract"""
+        #print("In ContractDefinition: name=" + js['name'])
+        skipped = set()
+        if self.function_filter is not None:
+            skipped = set(index for index, js_node in enumerate(js['nodes'])
+                          if not self.function_filter.keeps(js_node))
+        futures = {}
+        if self.executor is not None:
+            futures = self.submit_functions(js['nodes'], skipped)
+        ret_strs = []
+        for index, js_node in enumerate(js['nodes']):
+            if index in skipped:
+                self.skip(js_node)
+                continue
+            if index in futures:
+                text, output, flags, worker_stats = futures[index].result()
+                _add_worker_stats(worker_stats)
+                # Only use the worker's text if it started from the flags a
+                # serial run would have had here
+                if flags[0] == self.flags():
+                    sys.stdout.write(output)
+                    ret_strs.append(text)
+                    self.msg_found, self.found_first_function, \
+                        self.in_for_loop_header = flags[1]
+                    continue
+            ret_strs.append((yield js_node))
+        return "".join(ret_strs)
+
+    def flags(self):
+        """The state that carries over from one node's translation to the next"""
+        return (self.msg_found, self.found_first_function, self.in_for_loop_header)
+
+    def skip(self, js):
+        """Leaves a contract member untranslated, but updates the flags the
+           way translating it is expected to (see submit_functions)"""
+        if js['nodeType'] in _cached_types:
+            self.msg_found = False
+        if js['nodeType'] == 'FunctionDefinition':
+            self.found_first_function = True
+        if not self.in_for_loop_header and contains_node_type(js, 'ForStatement'):
+            self.in_for_loop_header = True
+
+    def submit_functions(self, js_nodes, skipped=()):
+        """Sends the functions and modifiers among js_nodes, other than the
+           indexes in skipped, to the executor, each with the flags a serial
+           run is expected to reach it with.
+           Returns a dict of node index -> future (see _translate_function)"""
+        futures = {}
+        found_first_function = self.found_first_function
+        in_for_loop_header = self.in_for_loop_header
+        for index, js_node in enumerate(js_nodes):
+            if js_node['nodeType'] in _cached_types and index not in skipped:
+                futures[index] = self.executor.submit(
+                    _translate_function, js_node,
+                    (False, found_first_function, in_for_loop_header))
+            # Translating a function sets found_first_function, and a for
+            # loop leaves in_for_loop_header set
+            if js_node['nodeType'] == 'FunctionDefinition':
+                found_first_function = True
+            if not in_for_loop_header and contains_node_type(js_node, 'ForStatement'):
+                in_for_loop_header = True
+        return futures
+
+    def parse_PragmaDirective(self, js):
+        """Indicates the solidity type we are compiling with"""
+        #print("In PragmaDirective")
+        return ""
+
+    def parse_SourceUnit(self, js):
+        """Top level node that holds all nodes"""
+        #print("In SourceUnit")
+        ret_strs = []
+        for js_node in js['nodes']:
+            ret_strs.append((yield js_node))
+        return "".join(ret_strs)
+
+    def _start(self, js):
+        """Starts translating one node. Returns its text, or for a node with
+           children, its handler's generator (see parse)"""
+        # Determine the node type and execute node specific code
+        handler = _handlers.get(js['nodeType'])
+        if handler is None:
+            print("Node type not recognized: " + str(js['nodeType']))
+            self.unrecognized_nodes += 1
+            return ""
+        return handler(self, js)
+
+    def parse(self, js):
+        """ Parses the input json tree to discover variable names
+            Handlers with children are generators that yield each child node
+            and are sent back its text. They are run from an explicit stack
+            rather than by recursion, so depth is limited by memory, not by
+            Python's recursion limit.
+            Expression handlers return lists of pieces instead of strings, and
+            are sent their children's pieces as is, so a long chain such as
+            a + b + c + ... is joined once rather than copied at every level.
+            Statement handlers do the same, and leave deduping spaces to
+            join_pieces, so nested ifs and loops are joined once per function.
+            Expressions are memoized by node id, so a subtree translated
+            more than once (like a loop condition) is only walked once.
+            With a function cache (see use_function_cache), functions and
+            modifiers translated by an earlier run are reused.
+            While profiling (see profiling.enable), each node type's handler
+            calls and time are counted"""
+        profile = profiling.current
+        # (memo key, translation, msg_found after it) per expression node
+        memo = {}
+        # (generator, node type, memo key, function cache key, unrecognized
+        #  node count at its start) for each unfinished handler
+        stack = []
+        node = js
+        result, memo_key, cache_key = self._start_cached(node, memo) if profile is None \
+                                      else self._start_timed(node, memo, profile)
+        while True:
+            if isinstance(result, (str, list)):
+                if isinstance(result, list) \
+                   and not (stack and stack[-1][1] in _piece_types):
+                    result = join_pieces(result)
+                if not stack:
+                    return result
+                text = result
+            else:
+                stack.append((result, node['nodeType'], memo_key, cache_key,
+                              self.unrecognized_nodes))
+                text = None
+            frame = stack[-1]
+            try:
+                if profile is None:
+                    node = frame[0].send(text)
+                else:
+                    started = time.perf_counter()
+                    try:
+                        node = frame[0].send(text)
+                    finally:
+                        profile.add_node_time(frame[1], time.perf_counter() - started)
+            except StopIteration as done:
+                _, _, done_memo_key, done_cache_key, unrecognized_nodes = stack.pop()
+                result = done.value
+                # Subtrees with unknown nodes are retranslated so their
+                # warnings are printed each time, as before
+                if unrecognized_nodes != self.unrecognized_nodes:
+                    continue
+                if done_memo_key is not None:
+                    memo[done_memo_key] = (result, self.msg_found)
+                elif done_cache_key is not None:
+                    _function_cache.put(_function_cache_version(), done_cache_key,
+                                        (result, self.msg_found, self.found_first_function,
+                                         self.in_for_loop_header))
+            else:
+                result, memo_key, cache_key = self._start_cached(node, memo) if profile is None \
+                                              else self._start_timed(node, memo, profile)
+
+    def _start_timed(self, js, memo, profile):
+        """_start_cached, counted in profile"""
+        started = time.perf_counter()
+        try:
+            return self._start_cached(js, memo)
+        finally:
+            profile.add_node(js['nodeType'], time.perf_counter() - started)
+
+    def _start_cached(self, js, memo):
+        """Like _start, but first looks for the node's translation in memo
+           and the function cache. Returns the translation or its handler's
+           generator, and the memo and function cache keys to store a new
+           translation under (or None)"""
+        if js['nodeType'] in _expression_types and 'id' in js:
+            key = (js['id'], self.msg_found, self.found_first_function,
+                   self.in_for_loop_header)
+            if key in memo:
+                result, self.msg_found = memo[key]
+                return result, None, None
+            return self._start(js), key, None
+        if _function_cache is not None and js['nodeType'] in _cached_types:
+            # The flags a function starts with can change its text too
+            key = "%s:%d%d%d" % (parse_cache.subtree_hash(js), self.msg_found,
+                                 self.found_first_function, self.in_for_loop_header)
+            cached = _function_cache.get(_function_cache_version(), key)
+            if cached is not None:
+                result, self.msg_found, self.found_first_function, \
+                    self.in_for_loop_header = cached
+                return result, None, None
+            return self._start(js), None, key
+        return self._start(js), None, None
+
+# Maps each nodeType to the Translator method that handles it
+_handlers = {
+    'SourceUnit': Translator.parse_SourceUnit,
+    'PragmaDirective': Translator.parse_PragmaDirective,
+    'ContractDefinition': Translator.parse_ContractDefinition,
+    'VariableDeclaration': Translator.parse_VariableDeclaration,
+    'VariableDeclarationStatement': Translator.parse_VariableDeclarationStatement,
+    'Mapping': Translator.parse_Mapping,
+    'ElementaryTypeName': Translator.parse_ElementaryTypeName,
+    'EventDefinition': Translator.parse_EventDefinition,
+    'ModifierDefinition': Translator.parse_ModifierDefinition,
+    'FunctionDefinition': Translator.parse_FunctionDefinition,
+    'FunctionCall': Translator.parse_FunctionCall,
+    'Return': Translator.parse_Return,
+    'ParameterList': Translator.parse_ParameterList,
+    'StructDefinition': Translator.parse_StructDefinition,
+    'EnumDefinition': Translator.parse_EnumDefinition,
+    'EnumValue': Translator.parse_EnumValue,
+    'UserDefinedTypeName': Translator.parse_UserDefinedTypeName,
+    'ArrayTypeName': Translator.parse_ArrayTypeName,
+    'TupleExpression': Translator.parse_TupleExpression,
+    'Block': Translator.parse_Block,
+    'IfStatement': Translator.parse_IfStatement,
+    'ForStatement': Translator.parse_ForStatement,
+    'WhileStatement': Translator.parse_WhileStatement,
+    'ExpressionStatement': Translator.parse_ExpressionStatement,
+    'Assignment': Translator.parse_Assignment,
+    'UnaryOperation': Translator.parse_UnaryOperation,
+    'BinaryOperation': Translator.parse_BinaryOperation,
+    'IndexAccess': Translator.parse_IndexAccess,
+    'MemberAccess': Translator.parse_MemberAccess,
+    'Identifier': Translator.parse_Identifier,
+    'ElementaryTypeNameExpression': Translator.parse_ElementaryTypeNameExpression,
+    'PlaceholderStatement': Translator.parse_PlaceholderStatement,
+    'Continue': Translator.parse_Continue,
+    'Literal': Translator.parse_Literal,
+}
+
+# The handlers that return (and take) lists of pieces rather than strings
+_expression_types = frozenset(['IndexAccess', 'BinaryOperation', 'UnaryOperation',
+                               'Assignment', 'MemberAccess', 'TupleExpression',
+                               'FunctionCall'])
+
+# The statement handlers that return (and take) lists of pieces
+_statement_types = frozenset(['Block', 'IfStatement', 'ForStatement', 'WhileStatement'])
+_piece_types = _expression_types | _statement_types
+
+# The handlers whose translations the function cache stores
+_cached_types = frozenset(['FunctionDefinition', 'ModifierDefinition'])
+
+# Bump when a change to the handlers or to magic_nlp changes the text produced
+# for the same AST, so function translations cached by older code aren't reused
+TRANSLATOR_VERSION = 1
+
+# Optionally caches function and modifier translations on disk across runs
+_function_cache = None
+_function_cache_tag = None
+def use_function_cache(path, max_bytes=64 * 1024 * 1024):
+    """Reuses function translations stored in path by earlier runs, and
+       stores new ones there"""
+    global _function_cache
+    _function_cache = parse_cache.DiskParseCache(path, max_bytes)
+
+def _function_cache_version():
+    """Identifies the translator and grammar that cached translations came from"""
+    global _function_cache_tag
+    if _function_cache_tag is None:
+        _function_cache_tag = "translator %d, grammar %s" % (
+            TRANSLATOR_VERSION, parse_cache.grammar_hash(magic_nlp.grammar()))
+    return _function_cache_tag
+
+# The stats counts added by _translate_function calls in worker processes.
+# Translators on different threads can add to it at once, so it is only
+# read or updated under _worker_stats_lock
+_worker_stats = Counter()
+_worker_stats_lock = threading.Lock()
+
+def _add_worker_stats(counts):
+    """Adds the stats counts a _translate_function call returned"""
+    with _worker_stats_lock:
+        _worker_stats.update(counts)
+
+def _translate_function(js, flags):
+    """Translates one function in a worker process, starting from flags (see
+       Translator.flags). Returns its text, what it printed, the flags it
+       started and ended with, and the stats counts it added"""
+    translator = Translator()
+    translator.msg_found, translator.found_first_function, \
+        translator.in_for_loop_header = flags
+    before = stats()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        text = translator.parse(js)
+    after = stats()
+    return (text, output.getvalue(), (flags, translator.flags()),
+            {key: after[key] - before[key] for key in after})
+
+class FunctionFilter:
+    """Selects the functions of each contract to translate. A function is
+       selected if it matches every criterion given: its name is among names,
+       its visibility among visibilities and, with payable or touches_msg,
+       it is payable (with payable) or uses msg or calls transfer or send
+       (with touches_msg). Modifiers and events are left out"""
+
+    def __init__(self, names=None, visibilities=None, payable=False, touches_msg=False):
+        self.names = frozenset(names) if names is not None else None
+        self.visibilities = frozenset(visibilities) if visibilities is not None else None
+        self.payable = payable
+        self.touches_msg = touches_msg
+
+    def keeps(self, js):
+        """Whether a contract member js is translated"""
+        if js['nodeType'] in ('ModifierDefinition', 'EventDefinition'):
+            return False
+        if js['nodeType'] != 'FunctionDefinition':
+            return True
+        if self.names is not None and js['name'] not in self.names:
+            return False
+        if self.visibilities is not None and js.get('visibility') not in self.visibilities:
+            return False
+        if not (self.payable or self.touches_msg):
+            return True
+        if self.payable and (js.get('stateMutability') == 'payable' or js.get('payable') is True):
+            return True
+        return self.touches_msg and touches_msg(js)
+
+# The members whose use touches_msg looks for, besides msg itself
+_fund_members = frozenset(['transfer', 'send'])
+
+def touches_msg(js):
+    """Whether the AST subtree js uses msg or calls transfer or send. Only
+       looks at Identifier and MemberAccess nodes, without translating"""
+    stack = [js]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (dict, compact_ast.Node)):
+            node_type = item.get('nodeType')
+            if node_type == 'Identifier' and item['name'] == 'msg':
+                return True
+            if node_type == 'MemberAccess' and item['memberName'] in _fund_members:
+                return True
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return False
+
+def contains_node_type(js, node_type):
+    """Whether the AST subtree js has a node of node_type"""
+    stack = [js]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (dict, compact_ast.Node)):
+            if item.get('nodeType') == node_type:
+                return True
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return False
+
+class _Deduped(list):
+    """Pieces whose joined text has its extra spaces removed (see
+       dedupe_spaces). Deduping the text around a piece also dedupes the
+       piece, so only the outermost of nested _Deduped lists is deduped"""
+
+_end_deduped = object()
+
+def join_pieces(pieces):
+    """Joins a nested list of strings, without recursing"""
+    ret_strs = []
+    # Where each _Deduped list being joined starts in ret_strs
+    starts = []
+    stack = [pieces]
+    while stack:
+        piece = stack.pop()
+        if isinstance(piece, str):
+            ret_strs.append(piece)
+        elif piece is _end_deduped:
+            start = starts.pop()
+            if not starts:
+                ret_strs[start:] = [dedupe_spaces("".join(ret_strs[start:]))]
+        else:
+            if isinstance(piece, _Deduped):
+                starts.append(len(ret_strs))
+                stack.append(_end_deduped)
+            stack.extend(reversed(piece))
+    return "".join(ret_strs)
+
+def parse(js):
+    """Translates a whole AST with a fresh Translator"""
+    return Translator().parse(js)
+
+# solc prints a banner (and, for several sources, "======= path =======")
+# before each json tree, so a tree starts at the first line opening with '{'
+_json_start = re.compile(rb'^[ \t]*\{', re.M)
+# Strings and brackets are all the loader needs to follow the json structure
+_json_token = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]', re.S)
+
+# Every json token, for trees nested too deeply for the json module
+_json_any_token = re.compile(rb'\s*(?:("(?:[^"\\]|\\.)*")|([{}\[\]:,])|([^\s{}\[\]:,"]+))', re.S)
+
+def _loads(data, object_hook=None):
+    """json.loads, falling back to _loads_deep for very deep trees"""
+    try:
+        return json.loads(data, object_hook=object_hook)
+    except RecursionError:
+        return _loads_deep(data, object_hook)
+
+def _loads_deep(data, object_hook=None):
+    """Decodes the json value at the start of data with an explicit stack
+       instead of recursion, so nesting is only limited by memory.
+       Like json.loads, passes each decoded object through object_hook"""
+    containers = []
+    keys = [] # The pending key of each open object
+    scalars = {} # Keys and node types repeat, so decode each only once
+    for token in _json_any_token.finditer(data):
+        string, punct, literal = token.groups()
+        if punct is None:
+            scalar = string or literal
+            value = scalars.get(scalar, scalars)
+            if value is scalars:
+                value = scalars[scalar] = json.loads(scalar)
+        elif punct in b'{[':
+            containers.append({} if punct == b'{' else [])
+            keys.append(None)
+            continue
+        elif punct in b'}]':
+            keys.pop()
+            value = containers.pop()
+            if object_hook is not None and punct == b'}':
+                value = object_hook(value)
+        else:
+            continue
+        if not containers:
+            return value
+        if isinstance(containers[-1], list):
+            containers[-1].append(value)
+        elif keys[-1] is None:
+            keys[-1] = value
+        else:
+            containers[-1][keys[-1]] = value
+            keys[-1] = None
+    raise ValueError("Unterminated json value")
+
+def load_solc_units(file_path, compact=False):
+    """Reads every source unit out of a solc --ast-compact-json dump, or out
+       of solc --standard-json or --combined-json output saved to a file.
+       With compact, the units are compact_ast nodes"""
+    object_hook = compact_ast.from_dict if compact else None
+    with open(file_path, 'rb') as file:
+        contents = file.read()
+    units = []
+    start_match = _json_start.search(contents)
+    if start_match is None:
+        raise ValueError("No json tree found in " + file_path)
+    while start_match is not None:
+        start = start_match.end() - 1
+        end = _json_tree_end(contents, start)
+        tree = _loads(contents[start:end], object_hook)
+        if 'sources' in tree and 'nodeType' not in tree:
+            for source in tree['sources'].values():
+                units.append(source['ast'] if 'ast' in source else source['AST'])
+        else:
+            units.append(tree)
+        start_match = _json_start.search(contents, end)
+    return units
+
+def _json_tree_end(contents, start):
+    """Returns the offset after the json tree at start"""
+    depth = 0
+    for token in _json_token.finditer(contents, start):
+        char = token.group()[:1]
+        if char in b'{[':
+            depth += 1
+        elif char != b'"':
+            depth -= 1
+            if depth == 0:
+                return token.end()
+    raise ValueError("Unterminated json tree at offset %d" % start)
+
+def iter_solc_nodes(file_path, compact=False):
+    """Yields the top level nodes (pragmas, contracts, ...) of every json tree
+       in a solc --ast-compact-json dump one at a time. The file is memory
+       mapped and only one node is decoded at a time, so memory use follows
+       the largest contract rather than the whole dump.
+       With compact, nodes are decoded straight into compact_ast nodes"""
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            # An empty file can't be memory mapped, and has no json tree
+            yield from iter_dump_nodes(b"", compact, file_path)
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+            yield from iter_dump_nodes(contents, compact, file_path)
+
+def iter_dump_nodes(contents, compact=False, name="the input"):
+    """Yields the top level nodes of every json tree in the bytes (or mmap)
+       of a solc --ast-compact-json dump, or of a bare json tree.
+       Raises ValueError, naming name, if there isn't one"""
+    object_hook = compact_ast.from_dict if compact else None
+    start_match = _json_start.search(contents)
+    if start_match is None:
+        raise ValueError("No json tree found in " + name)
+    while start_match is not None:
+        end = yield from _iter_unit_nodes(contents, start_match.end() - 1, object_hook)
+        start_match = _json_start.search(contents, end)
+
+def _iter_unit_nodes(contents, start, object_hook=None):
+    """Yields each element of the "nodes" list of the json tree at start
+       (or the whole tree if it has none). Returns the offset after the tree"""
+    depth = 0
+    last_string = None
+    in_nodes = False
+    found_nodes = False
+    node_start = None
+    for token in _json_token.finditer(contents, start):
+        char = token.group()[:1]
+        if char == b'"':
+            if depth == 1:
+                last_string = token.group()
+        elif char in b'{[':
+            depth += 1
+            if depth == 2 and char == b'[' and last_string == b'"nodes"':
+                in_nodes = found_nodes = True
+            elif depth == 3 and in_nodes:
+                node_start = token.start()
+        else:
+            if depth == 3 and node_start is not None:
+                yield _loads(contents[node_start:token.end()], object_hook)
+                node_start = None
+            elif depth == 2:
+                in_nodes = False
+            depth -= 1
+            if depth == 0:
+                if not found_nodes:
+                    yield _loads(contents[start:token.end()], object_hook)
+                return token.end()
+    raise ValueError("Unterminated json tree at offset %d" % start)
+
+# Compiles .sol inputs; see use_solc
+_solc_compiler = None
+def use_solc(solc="solc", jobs=None, ast_cache=None):
+    """Compiles .sol inputs with the solc binary, running at most jobs solc
+       processes at once. ast_cache names an optional on-disk cache of ASTs,
+       so sources unchanged since an earlier run aren't compiled again"""
+    global _solc_compiler
+    _solc_compiler = solc_ast.SolcCompiler(solc, jobs, ast_cache)
+
+def compile_sources(file_paths):
+    """Compiles the .sol files among file_paths together.
+       Returns {path: the source unit ASTs solc --ast-compact-json would print
+       for it, or the error compiling it raised}"""
+    sol_paths = [path for path in file_paths if path.endswith(".sol")]
+    if not sol_paths:
+        return {}
+    if _solc_compiler is None:
+        use_solc()
+    try:
+        asts = _solc_compiler.compile(sol_paths)
+    except solc_ast.CompileError as e:
+        # solc itself couldn't be run
+        return dict.fromkeys(sol_paths, e)
+    results = {}
+    for path in sol_paths:
+        try:
+            results[path] = _solc_compiler.source_units(asts, path)
+        except (solc_ast.CompileError, OSError) as e:
+            results[path] = e
+    return results
+
+def iter_input_nodes(file_path, units=None, compact=False):
+    """Yields the top level nodes of a solc json dump (see iter_solc_nodes),
+       or of a .sol file's source units. Those are compiled unless given.
+       With compact, the nodes are compact_ast nodes"""
+    if units is None and file_path.endswith(".sol"):
+        units = compile_sources([file_path])[file_path]
+    if isinstance(units, Exception):
+        raise units
+    if units is None:
+        yield from iter_solc_nodes(file_path, compact)
+        return
+    for unit in units:
+        for node in unit.get("nodes", [unit]):
+            yield compact_ast.compact(node) if compact else node
+
+def translate_nodes(nodes, executor=None, function_filter=None):
+    """Translates a stream of top level nodes (see iter_solc_nodes) with one
+       Translator into their final description. With an executor, each
+       contract's functions are translated on it in parallel. With a
+       FunctionFilter, only the functions it selects are translated"""
+    translator = Translator(executor, function_filter)
+    return _paragraph_breaks.sub("\n\n",
+                                 "".join([translator.parse(node) for node in nodes]))
+
+def translate_file(file_path, out_path, units=None, compact=False, function_filter=None):
+    """Translates one solc json or .sol file into out_path (see
+       output_paths, iter_input_nodes for units and compact, and
+       translate_nodes for function_filter).
+       Runs inside a batch worker, so failures are returned, not raised.
+       Also returns the stats counts this file added"""
+    before = stats()
+    try:
+        description = translate_nodes(iter_input_nodes(file_path, units, compact),
+                                      function_filter=function_filter)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, 'w') as out_file:
+            out_file.write(description + "\n")
+        error = None
+    except Exception as e:
+        error = "%s: %s" % (type(e).__name__, e)
+    after = stats()
+    nlp_stats = {key: after[key] - before[key] for key in after}
+    return (file_path, out_path, error, nlp_stats)
+
+def input_paths(inputs):
+    """The files matched by inputs: a glob, or a directory of json files"""
+    if os.path.isdir(inputs):
+        inputs = os.path.join(inputs, "*.json")
+    return sorted(glob.glob(inputs))
+
+def output_paths(file_paths, out_dir):
+    """Where each input's translation goes: out_dir/<name>.out, named after
+       the input's file name. Inputs whose names collide (the same file name
+       in different directories, or with different extensions) keep their
+       path relative to the directory they share instead, e.g.
+       out_dir/a/main.out and out_dir/b/main.out, so none overwrites another.
+       Returns {input path: output path}"""
+    names = {path: os.path.splitext(os.path.basename(path))[0] for path in file_paths}
+    collided = [path for path, count in Counter(names.values()).items() if count > 1]
+    collided = [path for path in file_paths if names[path] in collided]
+    if collided:
+        base = os.path.commonpath([os.path.dirname(os.path.abspath(path))
+                                   for path in collided])
+        for path in collided:
+            names[path] = os.path.relpath(os.path.splitext(os.path.abspath(path))[0], base)
+        # Same path but for the extension, e.g. token.json and token.sol
+        counts = Counter(names[path] for path in collided)
+        for path in collided:
+            if counts[names[path]] > 1:
+                names[path] = os.path.relpath(os.path.abspath(path), base)
+    return {path: os.path.join(out_dir, names[path] + ".out") for path in file_paths}
+
+def translate_project(inputs, out_dir, executor=None, compact=False, function_filter=None):
+    """Translates the files matched by inputs (see input_paths) as one
+       project: solc json dumps, saved --standard-json or --combined-json
+       output, or .sol files. Each file holds its own source unit and those
+       of everything it imports, so shared libraries appear in many files.
+       Each distinct source unit, by absolute path and content hash, is
+       translated once, with a fresh Translator. A unit that is part of more
+       than one file goes to out_dir/shared/<path>.out, and those files'
+       documentation refers to it rather than repeating it.
+       Returns a list of (input path, output path, error or None), and a dict
+       of counts: source units, translated (distinct) units and shared units"""
+    file_paths = input_paths(inputs)
+    out_paths = output_paths(file_paths, out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    compiled = compile_sources(file_paths)
+    # (file path, [(key, unit), ...] or the error loading it) per input
+    files = []
+    # (absolute path, content hash) -> the inputs holding that unit
+    holders = {}
+    for file_path in file_paths:
+        try:
+            if file_path.endswith(".sol"):
+                if isinstance(compiled[file_path], Exception):
+                    raise compiled[file_path]
+                units = [compact_ast.compact(unit) if compact else unit
+                         for unit in compiled[file_path]]
+            else:
+                units = load_solc_units(file_path, compact)
+        except Exception as e:
+            files.append((file_path, "%s: %s" % (type(e).__name__, e)))
+            continue
+        keyed_units = []
+        for unit in units:
+            key = (unit.get('absolutePath', file_path),
+                   parse_cache.subtree_hash(unit.get('nodes', [unit])))
+            holders.setdefault(key, set()).add(file_path)
+            keyed_units.append((key, unit))
+        files.append((file_path, keyed_units))
+
+    # Name each shared unit's document after its path, and its hash too if
+    # the project has several versions of the file
+    versions = Counter(path for path, _ in holders)
+    names = {}
+    for key in sorted(holders):
+        if len(holders[key]) > 1:
+            path, content_hash = key
+            name = re.sub(r'[^\w.-]+', '_', os.path.splitext(path)[0]).strip('_')
+            if versions[path] > 1:
+                name += "-" + content_hash[:8]
+            names[key] = name
+    # Different paths can still get the same name (contracts/math.sol and
+    # contracts_math.sol), so those names get a hash of the path as well
+    clashes = Counter(names.values())
+    shared_paths = {}
+    for key, name in names.items():
+        if clashes[name] > 1:
+            name += "-" + hashlib.sha1(key[0].encode()).hexdigest()[:8]
+        shared_paths[key] = os.path.join("shared", name + ".out")
+    if shared_paths:
+        os.makedirs(os.path.join(out_dir, "shared"), exist_ok=True)
+
+    texts = {}
+    results = []
+    for file_path, keyed_units in files:
+        out_path = out_paths[file_path]
+        if isinstance(keyed_units, str):
+            results.append((file_path, out_path, keyed_units))
+            continue
+        try:
+            parts = []
+            for key, unit in keyed_units:
+                if key not in texts:
+                    texts[key] = translate_nodes(unit.get('nodes', [unit]), executor,
+                                                 function_filter)
+                    if key in shared_paths:
+                        with open(os.path.join(out_dir, shared_paths[key]), 'w') as out_file:
+                            out_file.write(texts[key] + "\n")
+                if key in shared_paths:
+                    parts.append("\n\nSee %s for %s\n" % (shared_paths[key], key[0]))
+                else:
+                    parts.append(texts[key])
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, 'w') as out_file:
+                out_file.write(_paragraph_breaks.sub("\n\n", "".join(parts)) + "\n")
+            error = None
+        except Exception as e:
+            error = "%s: %s" % (type(e).__name__, e)
+        results.append((file_path, out_path, error))
+    counts = {"units": sum(len(holder) for holder in holders.values()),
+              "translated": len(texts), "shared": len(shared_paths)}
+    return results, counts
+
+def stats():
+    """magic_nlp.stats, plus how many functions this process reused from
+       the function cache and how many it translated"""
+    counts = magic_nlp.stats()
+    counts["functions_reused"] = 0
+    counts["functions_retranslated"] = 0
+    if _function_cache is not None:
+        counts["functions_reused"] = _function_cache.hits
+        counts["functions_retranslated"] = _function_cache.misses
+    with _worker_stats_lock:
+        for key, count in _worker_stats.items():
+            counts[key] += count
+    return counts
+
+def format_nlp_stats(nlp_stats, nlp_cache, function_cache=None, ast_cache=None):
+    """Summarizes stats counts for the end of a run. With an ast_cache, they
+       should include the counts of solc_ast.SolcCompiler.stats"""
+    lines = []
+    if ast_cache is not None:
+        lines.append("ast cache: %(asts_cached)d reused, %(solc_runs)d solc runs" % nlp_stats)
+    if function_cache is not None:
+        lines.append("function cache: %(functions_reused)d reused, "
+                     "%(functions_retranslated)d retranslated" % nlp_stats)
+    if nlp_cache is not None:
+        lines.append("nlp cache: %(cache_hits)d hits, %(cache_misses)d misses" % nlp_stats)
+    if nlp_stats["fallbacks"]:
+        lines.append("%(fallbacks)d phrases too long to parse were shallow parsed" % nlp_stats)
+    return "\n".join(lines)
+
+def _init_worker(nlp_cache, nltk_data, function_cache):
+    """Sets up a batch worker process"""
+    if nlp_cache is not None:
+        magic_nlp.use_disk_cache(nlp_cache)
+    if function_cache is not None:
+        use_function_cache(function_cache)
+    if nltk_data is not None:
+        magic_nlp.use_nltk_data(nltk_data)
+
+def translate_batch(inputs, out_dir, workers=None, nlp_cache=None, nltk_data=None,
+                    function_cache=None, compact=False, function_filter=None):
+    """Translates every solc json file matched by inputs (a directory or glob)
+       on a pool of worker processes. Matched .sol files are compiled first,
+       together (see use_solc). Each worker imports this module, NLTK
+       and the grammar once and then translates many files. nlp_cache names
+       an optional on-disk parse cache shared by all workers, nltk_data an
+       optional directory holding NLTK's models and function_cache an
+       optional on-disk cache of function translations (see
+       use_function_cache). With compact, files are translated as
+       compact_ast nodes, and with a FunctionFilter, only the functions it
+       selects are.
+       Returns a list of (input path, output path, error or None, nlp stats)"""
+    file_paths = input_paths(inputs)
+    out_paths = output_paths(file_paths, out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    units = compile_sources(file_paths)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(nlp_cache, nltk_data, function_cache)) as executor:
+        return list(executor.map(translate_file, file_paths,
+                                 [out_paths[path] for path in file_paths],
+                                 [units.get(path) for path in file_paths],
+                                 [compact] * len(file_paths),
+                                 [function_filter] * len(file_paths)))
+
+def _read_input(job):
+    """Pipeline stage: reads a (file path, units) job's file, unless it's a
+       .sol file that was compiled already"""
+    file_path, units = job
+    if units is not None:
+        return file_path, None, units
+    try:
+        with open(file_path, 'rb') as file:
+            return file_path, file.read(), None
+    except OSError as e:
+        return file_path, None, e
+
+def _translate_input(loaded, compact=False, function_filter=None):
+    """Pipeline stage, run in a worker process: translates what _read_input
+       loaded. Returns the input path, the description (or None and the
+       error) and the stats counts it added"""
+    file_path, contents, units = loaded
+    before = stats()
+    try:
+        nodes = iter_input_nodes(file_path, units, compact) if contents is None \
+                else iter_dump_nodes(contents, compact, file_path)
+        description = translate_nodes(nodes, function_filter=function_filter)
+        error = None
+    except Exception as e:
+        description, error = None, "%s: %s" % (type(e).__name__, e)
+    after = stats()
+    return (file_path, description, error,
+            {key: after[key] - before[key] for key in after})
+
+def _write_output(translated, out_paths):
+    """Pipeline stage: writes a translation into its output_paths path.
+       Returns the same tuple as translate_file"""
+    file_path, description, error, nlp_stats = translated
+    out_path = out_paths[file_path]
+    if error is None:
+        try:
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, 'w') as out_file:
+                out_file.write(description + "\n")
+        except OSError as e:
+            error = "%s: %s" % (type(e).__name__, e)
+    return (file_path, out_path, error, nlp_stats)
+
+def translate_pipeline(inputs, out_dir, workers=None, nlp_cache=None, nltk_data=None,
+                       function_cache=None, compact=False, function_filter=None,
+                       queue_size=16):
+    """Like translate_batch, but as a pipeline.Pipeline of reading (on
+       threads), translating (on worker processes) and writing (on threads),
+       so file I/O overlaps translation. At most queue_size files wait in
+       front of each stage, so memory use doesn't grow with the number of
+       inputs (the ASTs of .sol inputs, compiled up front, aside).
+       Returns translate_batch's list, in input order, and the
+       Pipeline.report of how the stages' queues filled"""
+    file_paths = input_paths(inputs)
+    out_paths = output_paths(file_paths, out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    units = compile_sources(file_paths)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(nlp_cache, nltk_data, function_cache)) as executor:
+        file_pipeline = pipeline.Pipeline([
+            pipeline.Stage("read", _read_input, concurrency=4),
+            # Two files per worker, so each has its next file waiting
+            pipeline.Stage("translate",
+                           partial(_translate_input, compact=compact,
+                                   function_filter=function_filter),
+                           executor, concurrency=2 * workers),
+            pipeline.Stage("write", partial(_write_output, out_paths=out_paths),
+                           concurrency=2),
+        ], queue_size)
+        results = file_pipeline.run((path, units.get(path)) for path in file_paths)
+    order = {path: index for index, path in enumerate(file_paths)}
+    results.sort(key=lambda result: order[result[0]])
+    return results, file_pipeline.report()
+
 if __name__ == "__main__":
-    # Get path to solc json output
-    file_path = sys.argv[1]
-    file_contents = ''
-    with open(file_path, 'r') as file:
-        line_num = 0
-        for line in file:
-            # Skip first 4 lines
-            if line_num >= 4:
-                file_contents += line;
-            line_num += 1
-    solc_json = json.loads(file_contents)
-    print("\n\n" + re.sub("[\n]{2,}", "\n\n", parse(solc_json)))
+    arg_parser = argparse.ArgumentParser(
+        description="Generate documentation from solc --ast-compact-json output")
+    arg_parser.add_argument("path", help="solc json or .sol file, or with --batch or --project,"
+                                         " a directory (of json files) or glob of them")
+    arg_parser.add_argument("--batch", action="store_true",
+                            help="translate every matched file into --out")
+    arg_parser.add_argument("--project", action="store_true",
+                            help="translate the matched files as one project, translating"
+                                 " source units shared between files only once")
+    arg_parser.add_argument("--out", default="outputFiles",
+                            help="directory for batch and project .out files"
+                                 " (default: outputFiles)")
+    arg_parser.add_argument("--workers", type=int, default=None,
+                            help="number of batch worker processes (default: one per CPU)")
+    arg_parser.add_argument("--nlp-cache", default=None, metavar="PATH",
+                            help="on-disk cache of NLP parses shared across runs")
+    arg_parser.add_argument("--nltk-data", default=None, metavar="DIR",
+                            help="directory holding NLTK's punkt and tagger models")
+    arg_parser.add_argument("--function-cache", default=None, metavar="PATH",
+                            help="on-disk cache of function translations; functions"
+                                 " unchanged since an earlier run are reused")
+    arg_parser.add_argument("--function-workers", type=int, default=None, metavar="N",
+                            help="translate each contract's functions on N worker"
+                                 " processes (single file mode only)")
+    arg_parser.add_argument("--stats", nargs="?", const="-", default=None, metavar="PATH",
+                            help="write a json profile of the run (time per node type,"
+                                 " NLP memo, tagger and parser use, slowest phrases)"
+                                 " to PATH, or to stderr (single file mode only)")
+    arg_parser.add_argument("--solc", default="solc", metavar="PATH",
+                            help="solc binary used to compile .sol inputs (default: solc)")
+    arg_parser.add_argument("--solc-jobs", type=int, default=None, metavar="N",
+                            help="most solc processes to run at once (default: one per CPU)")
+    arg_parser.add_argument("--ast-cache", default=None, metavar="PATH",
+                            help="on-disk cache of the ASTs of .sol inputs; sources"
+                                 " unchanged since an earlier run aren't recompiled")
+    arg_parser.add_argument("--compact-ast", action="store_true",
+                            help="translate compact nodes holding only the fields the"
+                                 " translator reads, to use less memory on large inputs")
+    arg_parser.add_argument("--functions", default=None, metavar="NAME[,NAME...]",
+                            help="only translate the functions with these names")
+    arg_parser.add_argument("--visibility", default=None, metavar="VIS[,VIS...]",
+                            help="only translate functions with these visibilities,"
+                                 " e.g. public,external")
+    arg_parser.add_argument("--payable", action="store_true",
+                            help="only translate payable functions (or, with"
+                                 " --touches-msg, functions that are either)")
+    arg_parser.add_argument("--touches-msg", action="store_true",
+                            help="only translate functions that use msg or call"
+                                 " transfer or send (or, with --payable, either)")
+    arg_parser.add_argument("--pipeline", action="store_true",
+                            help="with --batch, overlap reading, translating and writing"
+                                 " files, and report how the stages kept up")
+    arg_parser.add_argument("--queue-size", type=int, default=16, metavar="N",
+                            help="most files waiting in front of each --pipeline stage"
+                                 " (default: 16)")
+    args = arg_parser.parse_args()
+    function_filter = None
+    if args.functions or args.visibility or args.payable or args.touches_msg:
+        function_filter = FunctionFilter(
+            args.functions.split(",") if args.functions else None,
+            args.visibility.split(",") if args.visibility else None,
+            args.payable, args.touches_msg)
+    if args.batch and args.project:
+        arg_parser.error("--batch and --project can't be combined")
+    if args.pipeline and not args.batch:
+        arg_parser.error("--pipeline only works with --batch")
+    if args.batch and args.function_workers:
+        arg_parser.error("--function-workers can't be combined with --batch,"
+                         " which already translates files in parallel")
+    if args.stats is not None and (args.batch or args.function_workers):
+        arg_parser.error("--stats profiles this process, so it can't be combined"
+                         " with --batch or --function-workers")
+
+    use_solc(args.solc, args.solc_jobs, args.ast_cache)
+    if args.batch:
+        if args.pipeline:
+            results, pipeline_report = translate_pipeline(
+                args.path, args.out, args.workers, args.nlp_cache, args.nltk_data,
+                args.function_cache, args.compact_ast, function_filter, args.queue_size)
+        else:
+            results = translate_batch(args.path, args.out, args.workers,
+                                      args.nlp_cache, args.nltk_data, args.function_cache,
+                                      args.compact_ast, function_filter)
+        failures = 0
+        totals = dict.fromkeys(stats(), 0)
+        for file_path, out_path, error, nlp_stats in results:
+            for key in totals:
+                totals[key] += nlp_stats[key]
+            if error is None:
+                print("ok     %s -> %s" % (file_path, out_path))
+            else:
+                failures += 1
+                print("FAILED %s: %s" % (file_path, error))
+        print("%d translated, %d failed" % (len(results) - failures, failures))
+        totals.update(_solc_compiler.stats())
+        summary = format_nlp_stats(totals, args.nlp_cache, args.function_cache,
+                                   args.ast_cache)
+        if summary:
+            print(summary)
+        if args.pipeline:
+            print(pipeline.format_report(pipeline_report))
+        sys.exit(1 if failures else 0)
+    else:
+        if args.nlp_cache is not None:
+            magic_nlp.use_disk_cache(args.nlp_cache)
+        if args.function_cache is not None:
+            use_function_cache(args.function_cache)
+        if args.nltk_data is not None:
+            magic_nlp.use_nltk_data(args.nltk_data)
+        if args.stats is not None:
+            profiling.enable()
+        executor = None
+        if args.function_workers:
+            executor = ProcessPoolExecutor(max_workers=args.function_workers,
+                                           initializer=_init_worker,
+                                           initargs=(args.nlp_cache, args.nltk_data,
+                                                     args.function_cache))
+        try:
+            if args.project:
+                results, counts = translate_project(args.path, args.out, executor,
+                                                    args.compact_ast, function_filter)
+                failures = 0
+                for file_path, out_path, error in results:
+                    if error is None:
+                        print("ok     %s -> %s" % (file_path, out_path))
+                    else:
+                        failures += 1
+                        print("FAILED %s: %s" % (file_path, error))
+                print("%d translated, %d failed" % (len(results) - failures, failures))
+                print("%(units)d source units, %(translated)d distinct, "
+                      "%(shared)d shared between files" % counts)
+            else:
+                print("\n\n" + translate_nodes(
+                    iter_input_nodes(args.path, compact=args.compact_ast), executor,
+                    function_filter))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        summary = format_nlp_stats(dict(stats(), **_solc_compiler.stats()),
+                                   args.nlp_cache, args.function_cache, args.ast_cache)
+        if summary:
+            print(summary, file=sys.stderr)
+        if args.stats is not None:
+            report = dict(profiling.disable().report(), counts=stats())
+            if args.stats == "-":
+                json.dump(report, sys.stderr, indent=2)
+                print(file=sys.stderr)
+            else:
+                with open(args.stats, 'w') as stats_file:
+                    json.dump(report, stats_file, indent=2)
+        if args.project and failures:
+            sys.exit(1)
@@ -0,0 +1,113 @@
+# Runs items through a series of stages on asyncio, with a bounded queue in
+#  front of each stage. A stage's work runs on an executor (threads for file
+#  I/O, processes for translation), so I/O and CPU work overlap, and a full
+#  queue makes the stages before it wait, so only a few items are in memory
+#  at once however many there are.
+# The queues' depths show where items pile up, i.e. which stage is slowest.
+
+import asyncio
+import time
+
+# Tells a stage's tasks that no more items are coming.
+_DONE = object()
+
+
+class Stage:
+    # name - What to call the stage in reports
+    # func - Takes an item and returns the item for the next stage. Runs on
+    #  executor (None for asyncio's default thread pool), so must be
+    #  picklable if that's a process pool.
+    # concurrency - How many items the stage works on at once
+    def __init__(self, name, func, executor=None, concurrency=1):
+        self.name = name
+        self.func = func
+        self.executor = executor
+        self.concurrency = concurrency
+        self.queue = None
+        self.items = 0
+        self.seconds = 0.0
+        self.depth_total = 0
+        self.depth_samples = 0
+        self.peak_depth = 0
+
+
+class Pipeline:
+    # stages - The Stages, in order
+    # queue_size - The most items waiting in front of each stage
+    def __init__(self, stages, queue_size=16):
+        self.stages = stages
+        self.queue_size = queue_size
+
+    # Runs every item through the stages.
+    # Returns the last stage's results, in the order they finished.
+    def run(self, items):
+        return asyncio.run(self._run(items))
+
+    async def _run(self, items):
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(self.queue_size)
+        results = []
+        tasks = [asyncio.ensure_future(self._feed(items))]
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            tasks.append(asyncio.ensure_future(
+                self._run_stage(stage, next_stage, results)))
+        await asyncio.gather(*tasks)
+        return results
+
+    # Puts the items in front of the first stage, waiting whenever its queue
+    #  is full.
+    async def _feed(self, items):
+        stage = self.stages[0]
+        for item in items:
+            await stage.queue.put(item)
+        for _ in range(stage.concurrency):
+            await stage.queue.put(_DONE)
+
+    async def _run_stage(self, stage, next_stage, results):
+        await asyncio.gather(*[self._work(stage, next_stage, results)
+                               for _ in range(stage.concurrency)])
+        if next_stage is not None:
+            for _ in range(next_stage.concurrency):
+                await next_stage.queue.put(_DONE)
+
+    async def _work(self, stage, next_stage, results):
+        loop = asyncio.get_running_loop()
+        while True:
+            depth = stage.queue.qsize()
+            stage.depth_total += depth
+            stage.depth_samples += 1
+            stage.peak_depth = max(stage.peak_depth, depth)
+            item = await stage.queue.get()
+            if item is _DONE:
+                return
+            started = time.perf_counter()
+            result = await loop.run_in_executor(stage.executor, stage.func, item)
+            stage.seconds += time.perf_counter() - started
+            stage.items += 1
+            if next_stage is None:
+                results.append(result)
+            else:
+                await next_stage.queue.put(result)
+
+    # Returns how many items are waiting in front of each stage right now.
+    def depths(self):
+        return {stage.name: stage.queue.qsize() if stage.queue is not None else 0
+                for stage in self.stages}
+
+    # Returns, per stage, the items it handled, the seconds its items spent
+    #  running, and the mean and peak number of items waiting in front of it.
+    def report(self):
+        return {stage.name: {
+                    "items": stage.items, "seconds": stage.seconds,
+                    "mean_depth": stage.depth_total / stage.depth_samples
+                                  if stage.depth_samples else 0.0,
+                    "peak_depth": stage.peak_depth}
+                for stage in self.stages}
+
+
+# Summarizes a Pipeline.report in a line.
+def format_report(report):
+    return "queued before each stage (mean/peak): " + ", ".join(
+        "%s %.1f/%d" % (name, counts["mean_depth"], counts["peak_depth"])
+        for name, counts in report.items())
@@ -0,0 +1,86 @@
+# Collects where translation time goes: per node type, in magic_nlp's memo,
+#  in the tagger and in the chart parser. Off unless enable is called, and
+#  then only costs a check of profiling.current at each instrumented call.
+
+import heapq
+import time
+
+# The Profile being collected into, or None when profiling is off.
+current = None
+
+
+# Starts collecting into a new Profile.
+# slowest - How many of the slowest phrases to keep
+# Returns the Profile.
+def enable(slowest=10):
+    global current
+    current = Profile(slowest)
+    return current
+
+
+# Stops collecting.
+# Returns the Profile that was being collected into, or None.
+def disable():
+    global current
+    profile, current = current, None
+    return profile
+
+
+class Profile:
+    # slowest - How many of the slowest phrases to keep
+    def __init__(self, slowest=10):
+        self.started = time.perf_counter()
+        # nodeType -> [nodes translated, seconds in its handler]. A handler's
+        #  seconds leave out its children's handlers.
+        self.nodes = {}
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self.memo_size = 0
+        self.tagger_calls = 0
+        self.tagger_strings = 0
+        self.tagger_seconds = 0.0
+        self.tree_memo_hits = 0
+        self.parser_calls = 0
+        self.parser_seconds = 0.0
+        self.slowest = slowest
+        self._phrases = [] # A min heap of (seconds, phrase)
+
+    # Counts a node of node_type starting, and the seconds that took.
+    def add_node(self, node_type, seconds):
+        counts = self.nodes.setdefault(node_type, [0, 0.0])
+        counts[0] += 1
+        counts[1] += seconds
+
+    # Adds seconds spent resuming a node_type handler.
+    def add_node_time(self, node_type, seconds):
+        self.nodes.setdefault(node_type, [0, 0.0])[1] += seconds
+
+    # Records the seconds taken to tag and parse a phrase.
+    def add_phrase(self, phrase, seconds):
+        if len(self._phrases) < self.slowest:
+            heapq.heappush(self._phrases, (seconds, phrase))
+        elif seconds > self._phrases[0][0]:
+            heapq.heapreplace(self._phrases, (seconds, phrase))
+
+    # Returns everything collected, as a json-ready dict.
+    def report(self):
+        lookups = self.memo_hits + self.memo_misses
+        return {
+            "seconds": time.perf_counter() - self.started,
+            "node_types": {
+                node_type: {"calls": calls, "seconds": seconds}
+                for node_type, (calls, seconds) in sorted(
+                    self.nodes.items(), key=lambda item: -item[1][1])},
+            "parse_memo": {
+                "size": self.memo_size, "hits": self.memo_hits,
+                "misses": self.memo_misses,
+                "hit_rate": self.memo_hits / lookups if lookups else None},
+            "tagger": {"calls": self.tagger_calls, "strings": self.tagger_strings,
+                       "seconds": self.tagger_seconds},
+            "chart_parser": {"calls": self.parser_calls,
+                             "tree_memo_hits": self.tree_memo_hits,
+                             "seconds": self.parser_seconds},
+            "slowest_phrases": [
+                {"phrase": phrase, "seconds": seconds}
+                for seconds, phrase in sorted(self._phrases, reverse=True)],
+        }
@@ -0,0 +1,174 @@
+# Serves translations over HTTP, on localhost or a Unix socket, from worker
+#  processes that keep NLTK's models, the grammar and every memo loaded
+#  between requests.
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import magic_nlp
+import parser
+
+USAGE = """POST /translate  body: solc --ast-compact-json output (or a bare json tree)
+                 returns: its description
+POST /describe   body: phrases, one per line
+                 returns: the paragraph magic_nlp.py would print
+GET  /stats      returns: json counts of requests and cache use
+"""
+
+
+def _init_worker(nlp_cache, nltk_data, function_cache):
+    """Sets up a worker process and loads everything a translation needs"""
+    parser._init_worker(nlp_cache, nltk_data, function_cache)
+    try:
+        magic_nlp.warm_up()
+    except LookupError as e:
+        # Requests will report this too, but say it at startup as well
+        print(e, file=sys.stderr)
+
+def _run(job, body):
+    """Runs one request's job in a worker. Returns the text, or None and an
+       error message, and the stats counts the job added"""
+    before = parser.stats()
+    try:
+        if job == "translate":
+            nodes = list(parser.iter_dump_nodes(body, name="the request"))
+            if not nodes:
+                raise ValueError("No json tree found in the request")
+            text = parser.translate_nodes(nodes)
+        else:
+            text = magic_nlp.describe(body.decode().splitlines())
+        error = None
+    except Exception as e:
+        text, error = None, "%s: %s" % (type(e).__name__, e)
+    after = parser.stats()
+    return text, error, {key: after[key] - before[key] for key in after}
+
+class TranslationServer:
+    """Hands requests to a pool of worker processes and keeps totals.
+       Requests are accepted on threads, so one slow contract doesn't hold up
+       the others; the work itself runs in the workers, in parallel"""
+
+    def __init__(self, workers=None, nlp_cache=None, nltk_data=None, function_cache=None):
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                            initargs=(nlp_cache, nltk_data, function_cache))
+        # Start the workers (and so load the models) before the first request
+        self.executor.submit(int).result()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.totals = dict.fromkeys(parser.stats(), 0)
+
+    def run(self, job, body):
+        """Runs a "translate" or "describe" job. Returns (text, error)"""
+        text, error, job_stats = self.executor.submit(_run, job, body).result()
+        with self.lock:
+            self.requests += 1
+            if error is not None:
+                self.errors += 1
+            for key in self.totals:
+                self.totals[key] += job_stats[key]
+        return text, error
+
+    def stats(self):
+        with self.lock:
+            return dict(self.totals, requests=self.requests, errors=self.errors)
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Maps HTTP requests onto the TranslationServer at self.server.translator"""
+
+    def do_POST(self):
+        job = {"/translate": "translate", "/describe": "describe"}.get(self.path)
+        if job is None:
+            self.respond(404, USAGE)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        text, error = self.server.translator.run(job, body)
+        if error is not None:
+            self.respond(500, error + "\n")
+        else:
+            self.respond(200, text + "\n")
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.respond(200, json.dumps(self.server.translator.stats()) + "\n",
+                         "application/json")
+        else:
+            self.respond(404, USAGE)
+
+    def respond(self, status, text, content_type="text/plain; charset=utf-8"):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix socket"
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ThreadingHTTPServer, but on a Unix socket"""
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+def serve(translator, port=None, socket_path=None):
+    """Serves translator's jobs on localhost:port or on a Unix socket at
+       socket_path until interrupted"""
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        http_server = ThreadingUnixHTTPServer(socket_path, RequestHandler)
+        where = socket_path
+    else:
+        http_server = ThreadingHTTPServer(("127.0.0.1", port), RequestHandler)
+        where = "http://127.0.0.1:%d" % http_server.server_address[1]
+    http_server.translator = translator
+    print("serving on " + where, file=sys.stderr)
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Serve translations with NLTK and the caches kept warm",
+        epilog=USAGE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    where = arg_parser.add_mutually_exclusive_group()
+    where.add_argument("--port", type=int, default=8570,
+                       help="localhost port to listen on (default: 8570)")
+    where.add_argument("--socket", default=None, metavar="PATH",
+                       help="listen on a Unix socket at PATH instead")
+    arg_parser.add_argument("--workers", type=int, default=None,
+                            help="number of worker processes (default: one per CPU)")
+    arg_parser.add_argument("--nlp-cache", default=None, metavar="PATH",
+                            help="on-disk cache of NLP parses shared across runs")
+    arg_parser.add_argument("--nltk-data", default=None, metavar="DIR",
+                            help="directory holding NLTK's punkt and tagger models")
+    arg_parser.add_argument("--function-cache", default=None, metavar="PATH",
+                            help="on-disk cache of function translations")
+    args = arg_parser.parse_args()
+
+    translator = TranslationServer(args.workers, args.nlp_cache, args.nltk_data,
+                                   args.function_cache)
+    try:
+        serve(translator, args.port, args.socket)
+    finally:
+        translator.shutdown()
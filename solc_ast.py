@@ -0,0 +1,236 @@
+# Compiles .sol sources to compact json ASTs with a local solc, so parser.py
+#  can read Solidity directly instead of saved --ast-compact-json dumps.
+# Sources are compiled in batches through solc --standard-json, a few solc
+#  processes at a time, and each source's AST can be cached on disk by the
+#  hash of its name and contents and the compiler version. A cached AST is
+#  only reused while everything it imports is unchanged too.
+
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import parse_cache
+
+# The most sources to hand a single solc process.
+_BATCH_SIZE = 64
+
+
+# Raised when solc reports errors, or can't be run.
+class CompileError(Exception):
+    pass
+
+
+_versions = {}
+
+
+# Finds out which compiler a solc binary is. ASTs are only cached for the
+#  compiler that produced them.
+# solc - The solc binary to run
+# Returns its version string, e.g. "0.4.21+commit.dfe3193c.Linux.g++".
+def compiler_version(solc="solc"):
+    if solc not in _versions:
+        try:
+            output = subprocess.run([solc, "--version"], stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, check=True,
+                                    universal_newlines=True).stdout
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise CompileError("Can't run %s: %s" % (solc, e)) from None
+        lines = [line for line in output.splitlines()
+                 if line.startswith("Version:")]
+        _versions[solc] = lines[0].split(":", 1)[1].strip() if lines \
+            else output.strip()
+    return _versions[solc]
+
+
+# Reads a source file and the key its AST is cached under. The AST holds the
+#  source's name (and the names of the files it imports), so the key covers
+#  the name as well as the contents.
+# Returns (contents, hex digest of the name and contents).
+def _read_source(path):
+    with open(path, 'rb') as file:
+        contents = file.read()
+    digest = hashlib.sha1(path.encode())
+    digest.update(b"\0")
+    digest.update(contents)
+    return contents.decode(), digest.hexdigest()
+
+
+# Runs one solc process over some sources.
+# sources - {source name: contents}. Imports of other files are read by solc
+#  from the directories the sources are in.
+# Returns {source name: compact json AST} for the sources and everything they
+#  import.
+def _compile_batch(solc, sources):
+    standard_input = {
+        "language": "Solidity",
+        "sources": {name: {"content": contents}
+                    for name, contents in sources.items()},
+        "settings": {"outputSelection": {"*": {"": ["ast"]}}},
+    }
+    allowed = sorted(set(os.path.dirname(os.path.abspath(name))
+                         for name in sources))
+    try:
+        process = subprocess.run(
+            [solc, "--standard-json", "--allow-paths", ",".join(allowed)],
+            input=json.dumps(standard_input), stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError as e:
+        raise CompileError("Can't run %s: %s" % (solc, e)) from None
+    try:
+        output = json.loads(process.stdout)
+    except ValueError:
+        raise CompileError("%s exited with status %d: %s" % (
+            solc, process.returncode, process.stderr.strip())) from None
+    errors = [error.get("formattedMessage", error.get("message", ""))
+              for error in output.get("errors", [])
+              if error.get("severity") == "error"]
+    if errors:
+        raise CompileError("".join(errors).strip())
+    return {name: source["ast"]
+            for name, source in output.get("sources", {}).items()}
+
+
+# Returns the names of the files an AST's import directives refer to.
+def _imports(ast):
+    return [node["absolutePath"] for node in ast.get("nodes", [])
+            if node.get("nodeType") == "ImportDirective"]
+
+
+# Returns the names of everything a source imports, directly or not.
+# asts - {source name: compact json AST, or an error}
+def _dependencies(asts, name):
+    names = set()
+    stack = list(_imports(asts[name]))
+    while stack:
+        dep = stack.pop()
+        if dep not in names:
+            names.add(dep)
+            if isinstance(asts.get(dep), dict):
+                stack.extend(_imports(asts[dep]))
+    names.discard(name)
+    return names
+
+
+class SolcCompiler:
+    # solc - The solc binary to run
+    # jobs - The most solc processes to run at once (default: one per CPU)
+    # cache_path - An optional SQLite file caching ASTs across runs
+    # max_bytes - Evict the oldest cached ASTs once they exceed this
+    def __init__(self, solc="solc", jobs=None, cache_path=None,
+                 max_bytes=256 * 1024 * 1024):
+        self.solc = solc
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache = None
+        if cache_path is not None:
+            self.cache = parse_cache.DiskParseCache(cache_path, max_bytes)
+        # solc runs so far, counted under _lock since batches run on threads
+        self.compiled = 0
+        self._lock = threading.Lock()
+        self.reused = 0
+
+    # Compiles sources, skipping any whose AST is cached and whose imports
+    #  haven't changed since.
+    # paths - The .sol files to compile
+    # Returns {source name: compact json AST} for every path and every file
+    #  it imports, directly or not. A path's source name is the path itself.
+    #  Sources that couldn't be read or compiled map to the error instead.
+    def compile(self, paths):
+        version = "solc " + compiler_version(self.solc)
+        asts = {}
+        # Each source's cache key, or None if it can't be read
+        keys = {}
+
+        def key_of(name):
+            if name not in keys:
+                try:
+                    keys[name] = _read_source(name)[1]
+                except OSError:
+                    keys[name] = None
+            return keys[name]
+
+        pending = list(dict.fromkeys(paths))
+        while pending:
+            sources = {}
+            for name in pending:
+                try:
+                    contents, keys[name] = _read_source(name)
+                except OSError as e:
+                    asts[name] = e
+                    continue
+                cached = None
+                if self.cache is not None:
+                    cached = self.cache.get(version, keys[name])
+                # (AST, {imported source name: its key when cached})
+                if cached is not None and all(key_of(dep) == key
+                                              for dep, key in cached[1].items()):
+                    asts[name] = cached[0]
+                    self.reused += 1
+                else:
+                    sources[name] = contents
+            names = list(sources)
+            batches = [names[start:start + _BATCH_SIZE]
+                       for start in range(0, len(names), _BATCH_SIZE)]
+            compiled = {}
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                results = executor.map(
+                    lambda batch: self._compile_all(
+                        {name: sources[name] for name in batch}),
+                    batches)
+                for result in results:
+                    for name, ast in result.items():
+                        if name not in asts:
+                            asts[name] = compiled[name] = ast
+            if self.cache is not None:
+                for name, ast in compiled.items():
+                    if not isinstance(ast, dict) or key_of(name) is None:
+                        continue
+                    deps = {dep: key_of(dep) for dep in _dependencies(asts, name)}
+                    if None not in deps.values():
+                        self.cache.put(version, keys[name], (ast, deps))
+            # Cached ASTs may import files that weren't looked at yet
+            pending = list(dict.fromkeys(
+                name for ast in list(asts.values()) if isinstance(ast, dict)
+                for name in _imports(ast) if name not in asts))
+        return asts
+
+    # Compiles sources in one solc process. If that fails, compiles them one
+    #  at a time, so only the sources with errors are lost.
+    # Returns {source name: compact json AST, or the CompileError}.
+    def _compile_all(self, sources):
+        with self._lock:
+            self.compiled += 1
+        try:
+            return _compile_batch(self.solc, sources)
+        except CompileError as e:
+            if len(sources) == 1:
+                return {name: e for name in sources}
+        results = {}
+        for name, contents in sources.items():
+            results.update(self._compile_all({name: contents}))
+        return results
+
+    # Gathers the ASTs solc --ast-compact-json would print for one source:
+    #  its own and those of everything it imports, ordered by source name.
+    # asts - The result of compile
+    # Returns a list of ASTs. Raises the error for a source that didn't
+    #  compile.
+    def source_units(self, asts, path):
+        names = set()
+        stack = [path]
+        while stack:
+            name = stack.pop()
+            if name not in names:
+                if isinstance(asts[name], Exception):
+                    raise asts[name]
+                names.add(name)
+                stack.extend(_imports(asts[name]))
+        return [asts[name] for name in sorted(names)]
+
+    # Returns how many ASTs came from the cache, and how many solc runs there
+    #  were.
+    def stats(self):
+        return {"asts_cached": self.reused,
+                "solc_runs": self.compiled}
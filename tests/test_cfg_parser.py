@@ -0,0 +1,53 @@
+# Checks cfg_parser.CompiledParser against nltk.ChartParser.
+
+import random
+import unittest
+
+import nltk
+
+import cfg_parser
+import magic_nlp
+
+
+# Tree.leaves, without recursion.
+def _leaves(tree):
+    leaves = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, nltk.Tree):
+            stack.extend(reversed(node))
+        else:
+            leaves.append(node)
+    return leaves
+
+
+class CompiledParserTest(unittest.TestCase):
+    def setUp(self):
+        self.cfg = magic_nlp.grammar()
+        self.parser = cfg_parser.CompiledParser(self.cfg)
+
+    def test_same_first_tree_as_nltk(self):
+        chart_parser = nltk.ChartParser(self.cfg)
+        tags = sorted(self.parser._terminals)
+        rand = random.Random(570)
+        for _ in range(300):
+            tokens = [rand.choice(tags) for _ in range(rand.randint(1, 9))]
+            self.assertEqual(self.parser.parse(tokens),
+                             next(iter(chart_parser.parse(tokens)), None), tokens)
+
+    def test_long_unambiguous_sequences(self):
+        for tokens in (["NN", "VBZ"] + ["NN"] * 1000, ["VBN"] + ["NN"] * 1000,
+                       ["DT"] * 999 + ["NN"]):
+            tree = self.parser.parse(tokens, magic_nlp._PARSE_EDGE_BUDGET)
+            self.assertEqual(tree.label(), "Root")
+            self.assertEqual(_leaves(tree), tokens)
+
+    def test_budget(self):
+        tokens = ["NN", "CC"] * 40
+        with self.assertRaises(cfg_parser.ParseBudgetExceeded):
+            self.parser.parse(tokens, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
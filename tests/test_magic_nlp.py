@@ -0,0 +1,125 @@
+# Checks magic_nlp's preprocessing passes: that they merge the same phrases
+#  the original recursive passes did, and that they scale to long blocks.
+# These need NLTK's tagger models (see magic_nlp._MISSING_MODELS), and are
+#  skipped without them.
+
+import glob
+import os
+import time
+import unittest
+
+import magic_nlp
+
+_TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _have_models():
+    try:
+        magic_nlp.pos_tag("warm up")
+    except LookupError:
+        return False
+    return True
+
+
+# The recursive passes preproc_phrases and preproc_clauses replaced, as they
+#  were, to compare against. Like them, these memoize each merged string's
+#  tree so that later merges see it.
+def _reference_preproc_clauses(strings):
+    nltk = magic_nlp.nltk
+    if len(strings) < 2:
+        return strings
+    elif strings[0].strip() == "":
+        return _reference_preproc_phrases(strings[1:])
+    else:
+        ind_tree = magic_nlp.parse(strings[0], magic_nlp.grammar())
+        dep_tree = magic_nlp.parse(strings[1], magic_nlp.grammar())
+
+        if magic_nlp.is_noun_phrase(*ind_tree) and magic_nlp.is_verb_phrase(*dep_tree):
+            string = "%s %s" % (strings[0], strings[1])
+            magic_nlp._parse_memo[string] = (
+                nltk.tree.Tree("Root", [
+                    nltk.tree.Tree("NounP", [ind_tree[0][0] if ind_tree[0]
+                                             else ind_tree[1]]),
+                    nltk.tree.Tree("VerbP", [dep_tree[0][0] if dep_tree[0]
+                                             else dep_tree[1]])
+                ]),
+                ind_tree[1] + dep_tree[1])
+            return [string] + _reference_preproc_clauses(strings[2:])
+        else:
+            return [strings[0]] + _reference_preproc_clauses(strings[1:])
+
+
+def _reference_preproc_phrases(strings):
+    nltk = magic_nlp.nltk
+    if len(strings) < 2:
+        return strings
+    elif strings[0].strip() == "":
+        return _reference_preproc_phrases(strings[1:])
+    else:
+        ind_tree = magic_nlp.parse(strings[0], magic_nlp.grammar())
+        dep_tree = magic_nlp.parse(strings[1], magic_nlp.grammar())
+
+        for is_kind, label in ((magic_nlp.is_noun_phrase, "NounP"),
+                               (magic_nlp.is_verb_phrase, "VerbP")):
+            if is_kind(*ind_tree) and is_kind(*dep_tree):
+                string = "%s and %s" % (strings[0], strings[1])
+                magic_nlp._parse_memo[string] = (
+                    nltk.tree.Tree("Root", [
+                        nltk.tree.Tree(label, [
+                            nltk.tree.Tree(label, [ind_tree[0][0] if ind_tree[0]
+                                                   else ind_tree[1]]),
+                            "CC",
+                            nltk.tree.Tree(label, [dep_tree[0][0] if dep_tree[0]
+                                                   else dep_tree[1]])
+                        ])
+                    ]),
+                    ind_tree[1] + [("and", "CC")] + dep_tree[1])
+                return _reference_preproc_phrases([string] + strings[2:])
+        return [strings[0]] + _reference_preproc_phrases(strings[1:])
+
+
+def _read_lines(path):
+    with open(path, "r") as lines:
+        return [line.strip() for line in lines]
+
+
+# The words of some strings, leaving out each "and".
+def _words(strings):
+    return [word for string in strings for word in string.split() if word != "and"]
+
+
+@unittest.skipUnless(_have_models(), "NLTK's tagger models aren't installed")
+class PreprocTest(unittest.TestCase):
+    def setUp(self):
+        magic_nlp._parse_memo.clear()
+
+    def test_same_merges_as_recursive_passes(self):
+        paths = sorted(glob.glob(os.path.join(_TESTS_DIR, "nlp_test*.in")))
+        self.assertTrue(paths)
+        for path in paths:
+            lines = _read_lines(path)
+            expected = _reference_preproc_clauses(_reference_preproc_phrases(lines))
+            magic_nlp._parse_memo.clear()
+            self.assertEqual([str(phrase) for phrase in magic_nlp.preproc(lines)],
+                             expected, path)
+            magic_nlp._parse_memo.clear()
+
+    def test_scales_to_long_blocks(self):
+        lines = []
+        for path in sorted(glob.glob(os.path.join(_TESTS_DIR, "nlp_test*.in"))):
+            lines.extend(line for line in _read_lines(path) if line)
+        seconds = {}
+        for size in (10 ** 4, 10 ** 5):
+            block = (lines * (size // len(lines) + 1))[:size]
+            started = time.perf_counter()
+            phrases = magic_nlp.preproc(block)
+            seconds[size] = time.perf_counter() - started
+            # Merging only ever joins neighbours (with "and" between phrases),
+            #  so every line's words are kept, in order
+            self.assertEqual(_words(str(phrase) for phrase in phrases), _words(block))
+        # Linear growth would be 10x; quadratic list copying was 100x
+        self.assertLess(seconds[10 ** 5], 30 * max(seconds[10 ** 4], 0.01))
+
+
+if __name__ == "__main__":
+    unittest.main()
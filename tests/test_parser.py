@@ -0,0 +1,140 @@
+# Checks that parser.Translator handles deeply nested statements and long
+#  expression chains in about linear time, without hitting the recursion
+#  limit, that dumps without a json tree are reported, and how project mode
+#  names shared units. Each block holds a single statement, so no NLTK models
+#  are needed.
+
+import itertools
+import json
+import os
+import re
+import tempfile
+import time
+import unittest
+
+import parser
+
+_ids = itertools.count(1)
+
+
+def _identifier(name):
+    return {"nodeType": "Identifier", "name": name, "id": next(_ids)}
+
+
+# a0 + a1 + ... as a left-leaning chain of length operations
+def _chain(length):
+    expr = _identifier("a0")
+    for index in range(1, length):
+        expr = {"nodeType": "BinaryOperation", "operator": "+",
+                "leftExpression": expr,
+                "rightExpression": _identifier("a%d" % index), "id": next(_ids)}
+    return expr
+
+
+def _statement(expr):
+    return {"nodeType": "ExpressionStatement", "expression": expr, "id": next(_ids)}
+
+
+def _block(statement):
+    return {"nodeType": "Block", "statements": [statement], "id": next(_ids)}
+
+
+# depth ifs, each the true body (or with else_if, the false body) of the last
+def _nested_ifs(depth, else_if=False):
+    statement = _statement(_identifier("done"))
+    for index in range(depth):
+        condition = _identifier("c%d" % index)
+        if else_if:
+            statement = {"nodeType": "IfStatement", "condition": condition,
+                         "trueBody": _statement(_identifier("x")),
+                         "falseBody": statement, "id": next(_ids)}
+        else:
+            statement = {"nodeType": "IfStatement", "condition": condition,
+                         "trueBody": _block(statement), "falseBody": None,
+                         "id": next(_ids)}
+    return statement
+
+
+def _function(statement):
+    return {"nodeType": "FunctionDefinition", "name": "f",
+            "body": _block(statement), "id": next(_ids)}
+
+
+class DeepStatementTest(unittest.TestCase):
+    def _check_scaling(self, build, check):
+        seconds = {}
+        for size in (10 ** 4, 10 ** 5):
+            js = _function(build(size))
+            started = time.perf_counter()
+            text = parser.Translator().parse(js)
+            seconds[size] = time.perf_counter() - started
+            check(text, size)
+        # Linear growth would be 10x; joining at every level was 100x
+        self.assertLess(seconds[10 ** 5], 30 * max(seconds[10 ** 4], 0.01))
+
+    def test_nested_ifs(self):
+        def check(text, depth):
+            self.assertEqual(text.count("\nIf "), depth)
+            self.assertNotIn("  ", text)
+            self.assertTrue(text.startswith("\nIf c%d then do" % (depth - 1)))
+        self._check_scaling(_nested_ifs, check)
+
+    def test_else_if_chain(self):
+        def check(text, depth):
+            self.assertEqual(text.count("\nIf it is not the case that "), depth)
+            self.assertNotIn("  ", text)
+        self._check_scaling(lambda depth: _nested_ifs(depth, else_if=True), check)
+
+    def test_long_expression_chain(self):
+        def check(text, length):
+            self.assertEqual(text.count(" added to "), length - 1)
+            self.assertTrue(text.strip().endswith("a%d" % (length - 1)))
+        self._check_scaling(lambda length: _statement(_chain(length)), check)
+
+
+class DumpReadingTest(unittest.TestCase):
+    def test_no_json_tree(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, contents in (("empty.json", b""), ("garbage.json", b"hello\n")):
+                path = os.path.join(tmp, name)
+                with open(path, "wb") as file:
+                    file.write(contents)
+                with self.assertRaisesRegex(ValueError, "No json tree found in " + re.escape(path)):
+                    list(parser.iter_solc_nodes(path))
+                with self.assertRaisesRegex(ValueError, "No json tree found in the input"):
+                    list(parser.iter_dump_nodes(contents))
+
+
+# A source unit with one contract whose function's body is name
+def _unit(path, name):
+    return {"nodeType": "SourceUnit", "absolutePath": path, "id": next(_ids), "nodes": [
+        {"nodeType": "ContractDefinition", "name": "C", "id": next(_ids),
+         "nodes": [_function(_statement(_identifier(name)))]}]}
+
+
+class ProjectTest(unittest.TestCase):
+    def test_shared_unit_names_dont_collide(self):
+        units = [_unit("contracts/math.sol", "first"), _unit("contracts_math.sol", "second")]
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("a.json", "b.json"):
+                with open(os.path.join(tmp, name), "w") as file:
+                    file.write("".join(json.dumps(unit) + "\n" for unit in units))
+            out_dir = os.path.join(tmp, "out")
+            results, counts = parser.translate_project(tmp, out_dir)
+            self.assertEqual([error for _, _, error in results], [None, None])
+            self.assertEqual(counts["shared"], 2)
+            shared = sorted(os.listdir(os.path.join(out_dir, "shared")))
+            self.assertEqual(len(shared), 2)
+            texts = set()
+            for name in shared:
+                with open(os.path.join(out_dir, "shared", name)) as file:
+                    texts.add(file.read().strip())
+            self.assertEqual(texts, {"first", "second"})
+            with open(os.path.join(out_dir, "a.out")) as file:
+                text = file.read()
+            for name in shared:
+                self.assertIn(os.path.join("shared", name), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# Checks solc_ast.SolcCompiler's batching and AST cache against a fake solc,
+#  a script that answers --version and --standard-json the way solc does.
+
+import os
+import stat
+import sys
+import tempfile
+import unittest
+
+import solc_ast
+
+# Each source's AST is a SourceUnit with an ImportDirective per import line,
+#  holding the imported file's text, like the types a real AST gets from
+#  its imports. Each run appends its number of sources to runs.log.
+_FAKE_SOLC = '''#!%s
+import json, os, re, sys
+here = os.path.dirname(os.path.abspath(__file__))
+if "--version" in sys.argv:
+    print("solc, the solidity compiler commandline interface")
+    print("Version: 0.4.24+commit.e67f0147.Linux.g++")
+    sys.exit(0)
+sources = {name: source["content"]
+           for name, source in json.load(sys.stdin)["sources"].items()}
+with open(os.path.join(here, "runs.log"), "a") as log:
+    log.write("%%d\\n" %% len(sources))
+asts = {}
+stack = list(sources)
+while stack:
+    name = stack.pop()
+    if name in asts:
+        continue
+    if name not in sources:
+        with open(name) as file:
+            sources[name] = file.read()
+    nodes = []
+    for path in re.findall(r'import "([^"]+)";', sources[name]):
+        path = os.path.normpath(os.path.join(os.path.dirname(name), path))
+        with open(path) as file:
+            nodes.append({"nodeType": "ImportDirective", "absolutePath": path,
+                          "imported": file.read()})
+        stack.append(path)
+    asts[name] = {"nodeType": "SourceUnit", "absolutePath": name, "nodes": nodes}
+json.dump({"sources": {name: {"ast": ast} for name, ast in asts.items()}},
+          sys.stdout)
+''' % sys.executable
+
+
+class SolcCompilerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.solc = os.path.join(self.dir, "solc")
+        self.write("solc", _FAKE_SOLC)
+        os.chmod(self.solc, os.stat(self.solc).st_mode | stat.S_IEXEC)
+        self.cache = os.path.join(self.dir, "asts.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, contents):
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(contents)
+        return path
+
+    def runs(self):
+        with open(os.path.join(self.dir, "runs.log")) as log:
+            return [int(line) for line in log]
+
+    def compiler(self, jobs=None):
+        return solc_ast.SolcCompiler(self.solc, jobs, self.cache)
+
+    def test_same_contents_under_different_names(self):
+        main = 'import "./lib.sol";\n'
+        paths = [self.write("a/main.sol", main), self.write("b/main.sol", main)]
+        self.write("a/lib.sol", "library A {}\n")
+        self.write("b/lib.sol", "library B {}\n")
+        # b/main.sol has the same contents as a/main.sol, which is cached
+        self.compiler().compile(paths[:1])
+        compiler = self.compiler()
+        asts = compiler.compile(paths[1:])
+        self.assertEqual(compiler.stats()["solc_runs"], 1)
+        self.assertEqual(asts[paths[1]]["absolutePath"], paths[1])
+        self.assertEqual(asts[paths[1]]["nodes"][0]["imported"], "library B {}\n")
+        self.assertNotIn(paths[0], asts)
+
+    def test_recompiles_when_imports_change(self):
+        path = self.write("a/main.sol", 'import "./lib.sol";\n')
+        self.write("a/lib.sol", 'import "./base.sol";\n')
+        self.write("a/base.sol", "contract Base {}\n")
+        self.compiler().compile([path])
+
+        compiler = self.compiler()
+        compiler.compile([path])
+        self.assertEqual(compiler.stats(), {"asts_cached": 3, "solc_runs": 0})
+
+        # Only an indirect import changed
+        self.write("a/base.sol", "contract Base { uint x; }\n")
+        compiler = self.compiler()
+        asts = compiler.compile([path])
+        self.assertEqual(compiler.stats()["asts_cached"], 0)
+        lib = os.path.join(self.dir, "a", "lib.sol")
+        self.assertEqual(asts[lib]["nodes"][0]["imported"], "contract Base { uint x; }\n")
+
+    def test_batch_size(self):
+        paths = [self.write("src/c%d.sol" % index, "contract C%d {}\n" % index)
+                 for index in range(200)]
+        asts = solc_ast.SolcCompiler(self.solc, jobs=1).compile(paths)
+        self.assertEqual(sorted(asts), sorted(paths))
+        runs = self.runs()
+        self.assertEqual(sum(runs), 200)
+        self.assertLessEqual(max(runs), solc_ast._BATCH_SIZE)
+        self.assertEqual(len(runs), 4)
+
+        # With batches on several threads, every run is still counted
+        compiler = solc_ast.SolcCompiler(self.solc, jobs=4)
+        compiler.compile(paths)
+        self.assertEqual(compiler.stats()["solc_runs"], len(self.runs()) - 4)
+
+
+if __name__ == "__main__":
+    unittest.main()